@@ -0,0 +1,118 @@
+"""Warms up CloudFront and Origin Shield by requesting the URLs from a list stored in S3.
+
+The list contains one URL path per line. The function runs after the stack is deployed (as a
+custom resource) and on schedule.
+"""
+
+import concurrent.futures
+import os
+import time
+import urllib.error
+import urllib.request
+
+# Normalized Accept headers of the popular browsers. The next one is requested only if the
+# response depends on the Accept header
+ACCEPT_HEADERS = ["image/avif,image/webp", "image/jxl,image/avif,image/webp", ""]
+
+
+def parse_url_list(text):
+  lines = (line.strip() for line in text.splitlines())
+  return [line for line in lines if line and not line.startswith("#")]
+
+
+def max_concurrency(concurrency, task_max_count, container_cpu):
+  """Limits the concurrency by the number of imgproxy workers (2 per vCPU) of all tasks"""
+  workers = max(1, 2 * container_cpu // 1024)
+  return max(1, min(concurrency, task_max_count * workers))
+
+
+def warm_url(base_url, path, timeout=60):
+  """Requests the URL with the Accept headers. Returns True if all requests succeeded"""
+  for accept in ACCEPT_HEADERS:
+    request = urllib.request.Request(base_url + path)
+    if accept:
+      request.add_header("Accept", accept)
+
+    try:
+      with urllib.request.urlopen(request, timeout=timeout) as response:
+        response.read()
+        vary = response.headers.get("Vary", "").lower()
+    except (urllib.error.URLError, OSError):
+      return False
+
+    if "accept" not in vary:
+      break
+
+  return True
+
+
+def warm(base_url, paths, concurrency, deadline=None, log=print):
+  """Requests the URLs keeping at most `concurrency` requests in flight.
+
+  Stops sending new requests after the deadline (time.monotonic() value). Returns the stats.
+  """
+  stats = {"Total": len(paths), "Succeeded": 0, "Failed": 0, "Skipped": 0}
+  report_every = max(1, len(paths) // 10)
+
+  def collect(futures):
+    for future in futures:
+      stats["Succeeded" if future.result() else "Failed"] += 1
+      finished = stats["Succeeded"] + stats["Failed"]
+      if finished % report_every == 0:
+        log("Warmed {0}/{1} URLs".format(finished, len(paths)))
+
+  pending = set()
+
+  with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+    for n, path in enumerate(paths):
+      if deadline is not None and time.monotonic() > deadline:
+        stats["Skipped"] = len(paths) - n
+        log("Deadline reached, skipping {0} URLs".format(stats["Skipped"]))
+        break
+
+      if len(pending) >= concurrency:
+        done, pending = concurrent.futures.wait(
+          pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        collect(done)
+
+      pending.add(executor.submit(warm_url, base_url, path))
+
+    collect(concurrent.futures.as_completed(pending))
+
+  log("Done: {0}".format(stats))
+  return stats
+
+
+def run(context):
+  import boto3
+
+  bucket, _, key = os.environ["URL_LIST"][len("s3://"):].partition("/")
+  body = boto3.client("s3").get_object(Bucket=bucket, Key=key)["Body"].read()
+
+  concurrency = max_concurrency(
+    int(os.environ["CONCURRENCY"]),
+    int(os.environ["TASK_MAX_COUNT"]),
+    int(os.environ["CONTAINER_CPU"]),
+  )
+  # Leave time to respond to CloudFormation
+  deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000 - 30
+
+  return warm(os.environ["CLOUDFRONT_URL"], parse_url_list(body.decode("utf-8")), concurrency,
+              deadline)
+
+
+def handler(event, context):
+  if "RequestType" not in event:
+    return run(context)
+
+  import cfnresponse
+
+  data = {}
+  try:
+    if event["RequestType"] != "Delete":
+      data = run(context)
+  except Exception as e:
+    # Warming is best effort, it shouldn't fail the deployment
+    print("Warming failed: {0}".format(e))
+
+  cfnresponse.send(event, context, cfnresponse.SUCCESS, data, "CacheWarmer")
@@ -0,0 +1,138 @@
+"""Stores the images rendered by imgproxy in the result cache bucket.
+
+The function is triggered by the CloudFront standard logs. For each successful GET request that
+isn't in the bucket yet, it requests the image through CloudFront and stores it unless the result
+depends on the Accept header. CloudFront usually serves the image from its cache or Origin Shield
+where the viewer request left it, so imgproxy doesn't render it again.
+"""
+
+import concurrent.futures
+import gzip
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# The most popular browser Accept header, so the request gets the cache key of most viewers
+ACCEPT_HEADER = "image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8"
+
+CONCURRENCY = 8
+
+
+def log_uris(lines):
+  """Returns the unique (host, URI) pairs of the successful GET requests from the CloudFront log
+  lines. The host is the domain name of the distribution.
+  """
+  fields = []
+  uris = []
+
+  for line in lines:
+    if line.startswith("#Fields:"):
+      fields = line[len("#Fields:"):].split()
+      continue
+    if line.startswith("#") or not fields:
+      continue
+
+    entry = dict(zip(fields, line.rstrip("\n").split("\t")))
+    if entry.get("cs-method") != "GET" or entry.get("sc-status") != "200":
+      continue
+
+    # The log URL-encodes the URI the viewer requested
+    uri = (entry["cs(Host)"], urllib.parse.unquote(entry["cs-uri-stem"]))
+    if uri not in uris:
+      uris.append(uri)
+
+  return uris
+
+
+def object_key(uri):
+  """Returns the key of the object S3 serves for the URI"""
+  return urllib.parse.unquote(uri)[1:]
+
+
+def fetch(base_url, uri):
+  """Requests the URI through CloudFront. Returns the response or None if it can't be cached"""
+  request = urllib.request.Request(base_url + uri, headers={"Accept": ACCEPT_HEADER})
+
+  try:
+    response = urllib.request.urlopen(request, timeout=60)
+  except (urllib.error.URLError, OSError):
+    return None
+
+  with response:
+    vary = [v.strip().lower() for v in response.headers.get("Vary", "").split(",")]
+    # The result depends on the Accept header, so the bucket can't serve it to every viewer
+    if "accept" in vary or "*" in vary:
+      return None
+
+    return response.headers, response.read()
+
+
+def store(s3, bucket, uri, headers, body):
+  params = {
+    "Bucket": bucket,
+    "Key": object_key(uri),
+    "Body": body,
+    "ContentType": headers.get("Content-Type", "application/octet-stream"),
+  }
+  for header, param in [("Cache-Control", "CacheControl"),
+                        ("Content-Disposition", "ContentDisposition")]:
+    if headers.get(header):
+      params[param] = headers[header]
+
+  s3.put_object(**params)
+
+
+def exists(s3, bucket, uri):
+  try:
+    s3.head_object(Bucket=bucket, Key=object_key(uri))
+    return True
+  except Exception:
+    return False
+
+
+def write_back(s3, bucket, base_url, uris, deadline=None, concurrency=CONCURRENCY):
+  """Stores the results missing in the bucket. Returns the number of stored results.
+
+  The URIs are processed concurrently. The ones that don't start before the deadline
+  (time.monotonic() value) are skipped.
+  """
+  def write(uri):
+    if deadline is not None and time.monotonic() > deadline:
+      return False
+    if exists(s3, bucket, uri):
+      return False
+
+    result = fetch(base_url, uri)
+    if result is None:
+      return False
+
+    store(s3, bucket, uri, *result)
+    return True
+
+  with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+    return sum(executor.map(write, uris))
+
+
+def handler(event, context):
+  import boto3
+
+  s3 = boto3.client("s3")
+  # Leave time to finish the requests in flight
+  deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000 - 70
+
+  for record in event["Records"]:
+    log = s3.get_object(
+      Bucket=record["s3"]["bucket"]["name"],
+      Key=urllib.parse.unquote_plus(record["s3"]["object"]["key"]),
+    )
+    lines = gzip.decompress(log["Body"].read()).decode("utf-8").splitlines()
+
+    hosts = {}
+    for host, uri in log_uris(lines):
+      hosts.setdefault(host, []).append(uri)
+
+    stored = sum(write_back(s3, os.environ["RESULT_CACHE_BUCKET"], "https://" + host, uris,
+                            deadline) for host, uris in hosts.items())
+    print("Stored {0} results".format(stored))
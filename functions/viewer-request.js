@@ -0,0 +1,85 @@
+// imgproxy CloudFront viewer request function (cloudfront-js-2.0 runtime).
+//
+// The template passes the code through Fn::Sub to fill in the function settings, so the code
+// should not use template literals.
+
+var crypto = require('crypto');
+
+var NORMALIZE_ACCEPT = ${NormalizeAccept};
+
+var VERIFY_SIGNATURE = ${VerifySignature};
+var SIGNATURE_SIZE = ${SignatureSize};
+
+// Comma-separated hex keys and salts like in IMGPROXY_KEYS and IMGPROXY_SALTS. A signature is
+// valid if it matches any of the key and salt pairs
+var SIGNATURE_KEYS = '${SignatureKeys}'.split(',');
+var SIGNATURE_SALTS = '${SignatureSalts}'.split(',');
+
+// imgproxy endpoints that don't require a signature
+var UNSIGNED_PATHS = ['/', '/health', '/favicon.ico'];
+
+// Image formats imgproxy detects in the Accept header, in a fixed order
+var ACCEPT_FORMATS = ['image/jxl', 'image/avif', 'image/webp'];
+
+// Calculates the signature the same way imgproxy does: HMAC-SHA256 of the salt and the path
+// with the hex-decoded key, truncated to the signature size and encoded with URL-safe base64
+// without padding.
+function sign(key, salt, path) {
+  var hmac = crypto.createHmac('sha256', Buffer.from(key, 'hex'));
+  hmac.update(Buffer.from(salt, 'hex'));
+  hmac.update(path);
+
+  return Buffer.from(hmac.digest('hex'), 'hex')
+    .subarray(0, SIGNATURE_SIZE)
+    .toString('base64url');
+}
+
+// Checks the signature of the processing (/{signature}/...) or info (/info/{signature}/...) URL.
+// The signed path is the part of the URL after the signature, including the leading slash.
+// imgproxy doesn't start with a different number of keys and salts, so no signature is valid then.
+function verifySignature(uri) {
+  if (UNSIGNED_PATHS.indexOf(uri) !== -1) return true;
+
+  if (uri.indexOf('/info/') === 0) uri = uri.substring(5);
+
+  var pathStart = uri.indexOf('/', 1);
+  if (pathStart === -1) return false;
+
+  var signature = uri.substring(1, pathStart);
+  var path = uri.substring(pathStart);
+  if (SIGNATURE_KEYS.length !== SIGNATURE_SALTS.length) return false;
+
+  return SIGNATURE_KEYS.some(function (key, i) {
+    return sign(key.trim(), SIGNATURE_SALTS[i].trim(), path) === signature;
+  });
+}
+
+// Collapses the Accept header into the list of the image formats imgproxy detects, so requests
+// from different browsers with the same supported formats share the cache entry. imgproxy
+// checks whether the header contains the format name, so we do the same.
+function normalizeAccept(request) {
+  var header = request.headers.accept;
+  var accept = header ? header.value : '';
+
+  var formats = ACCEPT_FORMATS.filter(function (format) {
+    return accept.indexOf(format) !== -1;
+  });
+
+  if (formats.length > 0) {
+    request.headers.accept = { value: formats.join(',') };
+  } else {
+    delete request.headers.accept;
+  }
+}
+
+function handler(event) {
+  var request = event.request;
+
+  if (VERIFY_SIGNATURE && !verifySignature(request.uri)) {
+    return { statusCode: 403, statusDescription: 'Forbidden' };
+  }
+
+  if (NORMALIZE_ACCEPT) normalizeAccept(request);
+
+  return request;
+}
@@ -0,0 +1,208 @@
+import dataclasses
+import math
+
+# Memory reserved on EC2 instances for the OS and the ECS agent
+ecs_reserved_memory = 512
+
+
+@dataclasses.dataclass(frozen=True)
+class InstanceType:
+  """EC2 instance type specs.
+
+  Memory is in MiB, network bandwidth is in Gbps, and local NVMe storage is in GB. Burstable
+  network bandwidth is the "up to" bandwidth of the instance.
+  """
+  name: str
+  arch: str
+  vcpu: int
+  memory: int
+  network_bandwidth: float
+  burstable_network: bool = False
+  nvme: int = 0
+
+  @property
+  def cpu(self):
+    """CPU units the instance registers in the ECS cluster"""
+    return self.vcpu * 1024
+
+  @property
+  def available_memory(self):
+    """Memory available for the tasks"""
+    return self.memory - ecs_reserved_memory
+
+
+catalog = [
+  InstanceType("c8g.medium", "ARM64", 1, 2048, 12.5, burstable_network=True),
+  InstanceType("c8g.large", "ARM64", 2, 4096, 12.5, burstable_network=True),
+  InstanceType("c8g.xlarge", "ARM64", 4, 8192, 12.5, burstable_network=True),
+  InstanceType("c8g.2xlarge", "ARM64", 8, 16384, 15, burstable_network=True),
+  InstanceType("c8g.4xlarge", "ARM64", 16, 32768, 15, burstable_network=True),
+  InstanceType("c8g.8xlarge", "ARM64", 32, 65536, 15),
+  InstanceType("c8g.12xlarge", "ARM64", 48, 98304, 22.5),
+  InstanceType("c8g.16xlarge", "ARM64", 64, 131072, 30),
+  InstanceType("c8g.24xlarge", "ARM64", 96, 196608, 40),
+  InstanceType("c8g.48xlarge", "ARM64", 192, 393216, 50),
+  InstanceType("c7g.medium", "ARM64", 1, 2048, 12.5, burstable_network=True),
+  InstanceType("c7g.large", "ARM64", 2, 4096, 12.5, burstable_network=True),
+  InstanceType("c7g.xlarge", "ARM64", 4, 8192, 12.5, burstable_network=True),
+  InstanceType("c7g.2xlarge", "ARM64", 8, 16384, 15, burstable_network=True),
+  InstanceType("c7g.4xlarge", "ARM64", 16, 32768, 15, burstable_network=True),
+  InstanceType("c7g.8xlarge", "ARM64", 32, 65536, 15),
+  InstanceType("c7g.12xlarge", "ARM64", 48, 98304, 22.5),
+  InstanceType("c7g.16xlarge", "ARM64", 64, 131072, 30),
+  InstanceType("t4g.small", "ARM64", 2, 2048, 5, burstable_network=True),
+  InstanceType("t4g.medium", "ARM64", 2, 4096, 5, burstable_network=True),
+  InstanceType("t4g.large", "ARM64", 2, 8192, 5, burstable_network=True),
+  InstanceType("t4g.xlarge", "ARM64", 4, 16384, 5, burstable_network=True),
+  InstanceType("t4g.2xlarge", "ARM64", 8, 32768, 5, burstable_network=True),
+  InstanceType("c7i.large", "AMD64", 2, 4096, 12.5, burstable_network=True),
+  InstanceType("c7i.xlarge", "AMD64", 4, 8192, 12.5, burstable_network=True),
+  InstanceType("c7i.2xlarge", "AMD64", 8, 16384, 12.5, burstable_network=True),
+  InstanceType("c7i.4xlarge", "AMD64", 16, 32768, 12.5, burstable_network=True),
+  InstanceType("c7i.8xlarge", "AMD64", 32, 65536, 12.5),
+  InstanceType("c7i.12xlarge", "AMD64", 48, 98304, 18.75),
+  InstanceType("c7i.16xlarge", "AMD64", 64, 131072, 25),
+  InstanceType("c7a.large", "AMD64", 2, 4096, 12.5, burstable_network=True),
+  InstanceType("c7a.xlarge", "AMD64", 4, 8192, 12.5, burstable_network=True),
+  InstanceType("c7a.2xlarge", "AMD64", 8, 16384, 12.5, burstable_network=True),
+  InstanceType("c7a.4xlarge", "AMD64", 16, 32768, 12.5, burstable_network=True),
+  InstanceType("c7a.8xlarge", "AMD64", 32, 65536, 12.5),
+  InstanceType("c7a.12xlarge", "AMD64", 48, 98304, 18.75),
+  InstanceType("c7a.16xlarge", "AMD64", 64, 131072, 25),
+  InstanceType("c6i.large", "AMD64", 2, 4096, 12.5, burstable_network=True),
+  InstanceType("c6i.xlarge", "AMD64", 4, 8192, 12.5, burstable_network=True),
+  InstanceType("c6i.2xlarge", "AMD64", 8, 16384, 12.5, burstable_network=True),
+  InstanceType("c6i.4xlarge", "AMD64", 16, 32768, 12.5, burstable_network=True),
+  InstanceType("c6i.8xlarge", "AMD64", 32, 65536, 12.5),
+  InstanceType("c6i.12xlarge", "AMD64", 48, 98304, 18.75),
+  InstanceType("c6i.16xlarge", "AMD64", 64, 131072, 25),
+  InstanceType("c6a.large", "AMD64", 2, 4096, 12.5, burstable_network=True),
+  InstanceType("c6a.xlarge", "AMD64", 4, 8192, 12.5, burstable_network=True),
+  InstanceType("c6a.2xlarge", "AMD64", 8, 16384, 12.5, burstable_network=True),
+  InstanceType("c6a.4xlarge", "AMD64", 16, 32768, 12.5, burstable_network=True),
+  InstanceType("c6a.8xlarge", "AMD64", 32, 65536, 12.5),
+  InstanceType("c6a.12xlarge", "AMD64", 48, 98304, 18.75),
+  InstanceType("c6a.16xlarge", "AMD64", 64, 131072, 25),
+  InstanceType("t3.small", "AMD64", 2, 2048, 5, burstable_network=True),
+  InstanceType("t3.medium", "AMD64", 2, 4096, 5, burstable_network=True),
+  InstanceType("t3.large", "AMD64", 2, 8192, 5, burstable_network=True),
+  InstanceType("t3.xlarge", "AMD64", 4, 16384, 5, burstable_network=True),
+  InstanceType("t3.2xlarge", "AMD64", 8, 32768, 5, burstable_network=True),
+]
+
+catalog_by_name = {t.name: t for t in catalog}
+
+
+def instance_type_names(arch=None):
+  """Returns the names of the instance types of the architecture or of all instance types"""
+  return [t.name for t in catalog if arch is None or t.arch == arch]
+
+
+def get_instance_type(name):
+  try:
+    return catalog_by_name[name]
+  except KeyError:
+    raise ValueError("Unsupported instance type: {0}".format(name)) from None
+
+
+def tasks_per_instance(instance_type, container_cpu, container_memory):
+  """Returns the number of tasks that fit into the instance"""
+  return max(0, min(
+    math.floor(instance_type.cpu / container_cpu),
+    math.floor(instance_type.available_memory / container_memory),
+  ))
+
+
+def resource_grid(step, limit, minimum=0):
+  """Returns the values from the minimum up to the limit with the step doubling every 16 steps.
+
+  CloudFormation rules can't compare numbers, so the template allows only these values for the
+  task resources and the rules check each of them.
+  """
+  values = []
+  value = step
+
+  while value <= limit:
+    if value >= minimum:
+      values.append(value)
+    if value >= step * 16:
+      step *= 2
+    value += step
+
+  return values
+
+
+def cpu_values():
+  """Returns the ContainerCpu values allowed for the EC2 launch type"""
+  return resource_grid(1024, max(t.cpu for t in catalog))
+
+
+def memory_values():
+  """Returns the ContainerMemory values allowed for the EC2 launch type"""
+  return resource_grid(128, max(t.available_memory for t in catalog), minimum=512)
+
+
+def fit_buckets(capacity, values):
+  """Splits the allowed values of the task resource into buckets by the instance capacity.
+
+  capacity is a function returning the instance capacity of the resource. Returns a list of
+  (values, fitting instance type names, too small instance type names) tuples for each capacity
+  except the smallest one since any value that fits in it fits in every instance.
+  """
+  capacities = sorted(set(capacity(t) for t in catalog))
+
+  buckets = []
+  for prev, cap in zip(capacities, capacities[1:]):
+    bucket = [v for v in values if prev < v <= cap]
+    if not bucket:
+      continue
+
+    fitting = [t.name for t in catalog if capacity(t) >= cap]
+    too_small = [t.name for t in catalog if capacity(t) < cap]
+    buckets.append((bucket, fitting, too_small))
+
+  return buckets
+
+
+def format_catalog(container_cpu, container_memory, arch=None):
+  lines = ["{0:<14}  {1:>5}  {2:>4}  {3:>10}  {4:>12}  {5:>4}  {6:>5}  {7:>12}  {8:>15}".format(
+    "Instance type", "Arch", "vCPU", "Memory MiB", "Network Gbps", "NVMe", "Tasks",
+    "Stranded CPU", "Stranded memory")]
+
+  for t in catalog:
+    if arch is not None and t.arch != arch:
+      continue
+
+    tasks = tasks_per_instance(t, container_cpu, container_memory)
+    lines.append(
+      "{0:<14}  {1:>5}  {2:>4}  {3:>10}  {4:>12}  {5:>4}  {6:>5}  {7:>12}  {8:>15}".format(
+        t.name, t.arch, t.vcpu, t.memory,
+        "{0}{1:g}".format("up to " if t.burstable_network else "", t.network_bandwidth),
+        t.nvme or "-", tasks,
+        t.cpu - tasks * container_cpu if tasks else "-",
+        t.available_memory - tasks * container_memory if tasks else "-",
+      ))
+
+  return "\n".join(lines)
+
+
+def add_cli_arguments(cli_parser):
+  cli_parser.add_argument("--container-cpu",
+                          type=int,
+                          default=1024,
+                          help="Amount of CPU to give to the container. Default: 1024")
+  cli_parser.add_argument("--container-memory",
+                          type=int,
+                          default=1536,
+                          help=("Amount of memory in megabytes to give to the container."
+                                " Default: 1536"))
+  cli_parser.add_argument("-a", "--arch",
+                          choices=["ARM64", "AMD64"],
+                          help="Show only the instance types of the CPU architecture")
+
+
+def main(args, cli_parser):
+  if args.container_cpu <= 0 or args.container_memory <= 0:
+    cli_parser.error("Container CPU and memory should be greater than 0")
+
+  print(format_catalog(args.container_cpu, args.container_memory, args.arch))
@@ -0,0 +1,320 @@
+import math
+
+import instance_types
+import template
+
+# imgproxy processes IMGPROXY_WORKERS images concurrently. By default, it's the number of CPUs
+# times two
+default_workers_per_vcpu = 2
+
+# Thresholds of the AutoscalingHighConcurrencyUsageAlarm and AutoscalingLowConcurrencyUsageAlarm
+scale_out_threshold = 80
+scale_in_threshold = 50
+
+# Target tracking policies scale in when the metric drops below 90% of the target value
+target_tracking_scale_in_ratio = 0.9
+
+# Allowed values of ScalingTargetConcurrencyUtilization
+target_tracking_min_target = 10
+target_tracking_max_target = 100
+
+
+def plan_capacity(peak_rps, processing_time, target_utilization=0.7, min_rps=0,
+                  launch_type="fargate", container_cpu=None, container_memory=None,
+                  instance_type="c8g.medium", workers_per_vcpu=default_workers_per_vcpu,
+                  min_tasks=2, scaling_mode="step", options=None):
+  """Calculates the service and cluster sizes needed to handle the peak load.
+
+  The number of in-flight requests is estimated with Little's law as the request rate times the
+  mean processing time. The tasks are sized so their ConcurrencyUtilization stays at the target
+  utilization. With step scaling, it should be below the scale-out alarm threshold. With target
+  tracking, it becomes the ScalingTargetConcurrencyUtilization value.
+
+  When container_cpu is not set, the smallest CPU value that keeps TaskMaxCount within the limit
+  of the template is used. Fargate tasks are limited by the addresses of the subnets the template
+  built with the options (template.Options) creates.
+  """
+  if peak_rps <= 0 or processing_time <= 0:
+    raise ValueError("Peak RPS and processing time should be greater than 0")
+
+  if scaling_mode == "step":
+    if not 0 < target_utilization * 100 < scale_out_threshold:
+      raise ValueError("Target utilization should be between 0 and {0}%".format(
+        scale_out_threshold))
+    scale_out_utilization, scale_in_utilization = scale_out_threshold, scale_in_threshold
+  elif scaling_mode == "target-tracking":
+    target = round(target_utilization * 100)
+    if not target_tracking_min_target <= target <= target_tracking_max_target:
+      raise ValueError("Target utilization should be between {0}% and {1}%".format(
+        target_tracking_min_target, target_tracking_max_target))
+    target_utilization = target / 100
+    scale_out_utilization = target
+    scale_in_utilization = target * target_tracking_scale_in_ratio
+  else:
+    raise ValueError("Unknown scaling mode: {0}".format(scaling_mode))
+
+  if min_rps < 0 or min_rps > peak_rps:
+    raise ValueError("Minimum RPS should be between 0 and the peak RPS")
+
+  if options is None:
+    options = template.Options(launch_type=launch_type)
+
+  if container_cpu is not None:
+    if launch_type == "fargate" and container_cpu not in template.fargate_cpu_values:
+      raise ValueError("Fargate supports the following CPU values: {0}".format(
+        ", ".join(str(v) for v in template.fargate_cpu_values)))
+
+    if container_cpu < 1024:
+      raise ValueError("Container CPU should be at least 1024")
+
+    if launch_type == "ec2" and container_cpu not in instance_types.cpu_values():
+      raise ValueError("The EC2 template allows the following CPU values: {0}".format(
+        ", ".join(str(v) for v in instance_types.cpu_values())))
+
+    cpu_values = [container_cpu]
+  elif launch_type == "fargate":
+    cpu_values = [v for v in template.fargate_cpu_values if v >= 1024]
+  else:
+    # Only the sizes that fit into the instance
+    instance_cpu = instance_types.get_instance_type(instance_type).cpu
+    cpu_values = [v for v in instance_types.cpu_values() if v <= instance_cpu] or [1024]
+
+  # EC2 tasks use the instance network, and the template without network uses existing subnets
+  task_count_limit = None
+  if launch_type == "fargate" and not options.no_network:
+    task_count_limit = template.max_task_count(options)
+
+  peak_concurrency = peak_rps * processing_time
+  min_concurrency = min_rps * processing_time
+
+  for container_cpu in cpu_values:
+    vcpu = container_cpu / 1024
+    workers = max(1, math.floor(vcpu * workers_per_vcpu))
+    task_max_count = max(min_tasks, math.ceil(peak_concurrency / (workers * target_utilization)))
+    if task_count_limit is None or task_max_count <= task_count_limit:
+      break
+  else:
+    raise ValueError(("TaskMaxCount {0} with {1} CPU exceeds the {2} tasks the subnets of the"
+                      " template can hold. Use larger or more subnets, or larger tasks").format(
+                        task_max_count, container_cpu, task_count_limit))
+
+  task_min_count = max(min_tasks, math.ceil(min_concurrency / (workers * target_utilization)))
+
+  headroom_utilization = scale_out_threshold if scaling_mode == "step" else 100
+
+  plan = {
+    "parameters": {
+      "ContainerCpu": container_cpu,
+      "TaskDesiredCount": task_min_count,
+      "TaskMinCount": task_min_count,
+      "TaskMaxCount": task_max_count,
+    },
+    "workers_per_task": workers,
+    "task_count_limit": task_count_limit,
+    "peak_concurrency": peak_concurrency,
+    "peak_utilization": peak_concurrency / (task_max_count * workers) * 100,
+    "scaling_mode": scaling_mode,
+    "scale_out_utilization": scale_out_utilization,
+    "scale_in_utilization": scale_in_utilization,
+    # How much the peak load can grow before the scale-out alarm fires at the max task count.
+    # Target tracking scales out right above the target, so count until the workers are all busy
+    "scale_out_headroom": headroom_utilization / target_utilization / 100 - 1,
+    # The load at which the fleet of max tasks starts scaling in
+    "scale_in_rps": task_max_count * workers * scale_in_utilization / 100 / processing_time,
+    # The load the fleet of max tasks can handle before the scale-out alarm fires
+    "max_rps": task_max_count * workers * scale_out_utilization / 100 / processing_time,
+  }
+
+  if scaling_mode == "target-tracking":
+    plan["parameters"].update({
+      "ScalingMode": scaling_mode,
+      "ScalingTargetConcurrencyUtilization": scale_out_utilization,
+    })
+
+  if launch_type == "fargate":
+    container_memory = container_memory or int(vcpu * 2048)
+    if container_memory not in template.fargate_memory_values[container_cpu]:
+      raise ValueError("Fargate supports the following memory values for {0} CPU: {1}".format(
+        container_cpu, ", ".join(str(v) for v in template.fargate_memory_values[container_cpu])))
+
+    plan["parameters"]["ContainerMemory"] = container_memory
+    return plan
+
+  instance = instance_types.get_instance_type(instance_type)
+  available_memory = instance.available_memory
+
+  tasks_per_instance = math.floor(instance.cpu / container_cpu)
+  if tasks_per_instance < 1:
+    raise ValueError("{0} doesn't have enough CPU for a task with {1} CPU".format(
+      instance_type, container_cpu))
+
+  memory_values = instance_types.memory_values()
+
+  if container_memory is None:
+    # Split the instance memory between the tasks so it's not stranded, rounding down to a value
+    # the template allows
+    share = available_memory / tasks_per_instance
+    container_memory = max([v for v in memory_values if v <= share], default=0)
+
+  if container_memory < 512:
+    raise ValueError("{0} doesn't have enough memory for {1} tasks".format(
+      instance_type, tasks_per_instance))
+
+  if container_memory not in memory_values:
+    raise ValueError("The EC2 template allows the following memory values: {0}".format(
+      ", ".join(str(v) for v in memory_values)))
+
+  tasks_per_instance = min(tasks_per_instance, math.floor(available_memory / container_memory))
+  if tasks_per_instance < 1:
+    raise ValueError("{0} doesn't have enough memory for a task with {1} MiB".format(
+      instance_type, container_memory))
+
+  cluster_min_size = math.ceil(task_min_count / tasks_per_instance)
+
+  plan["parameters"].update({
+    "ContainerMemory": container_memory,
+    "CpuArchitecture": instance.arch,
+    "ClusterInstanceType": instance_type,
+    "ClusterDeisedSize": cluster_min_size,
+    "ClusterMinSize": cluster_min_size,
+    "ClusterMaxSize": math.ceil(task_max_count / tasks_per_instance),
+  })
+  plan["tasks_per_instance"] = tasks_per_instance
+  plan["stranded_cpu"] = instance.cpu - tasks_per_instance * container_cpu
+  plan["stranded_memory"] = available_memory - tasks_per_instance * container_memory
+
+  return plan
+
+
+def format_plan(plan):
+  lines = [
+    "Workers per task: {0}".format(plan["workers_per_task"]),
+    "Peak concurrency: {0:.1f} requests in flight".format(plan["peak_concurrency"]),
+    "Peak utilization at TaskMaxCount: {0:.1f}%".format(plan["peak_utilization"]),
+  ]
+
+  if plan["task_count_limit"] is not None:
+    lines.append("TaskMaxCount limit: {0} tasks fit into the subnets".format(
+      plan["task_count_limit"]))
+
+  if plan["scaling_mode"] == "step":
+    lines += [
+      "Scale-out headroom: the load can grow by {0:.0%} before the {1}% alarm fires".format(
+        plan["scale_out_headroom"], plan["scale_out_utilization"]),
+      "Max capacity: {0:.1f} RPS before the {1}% alarm fires at TaskMaxCount".format(
+        plan["max_rps"], plan["scale_out_utilization"]),
+    ]
+  else:
+    lines += [
+      "Saturation headroom: the load can grow by {0:.0%} before all workers are busy".format(
+        plan["scale_out_headroom"]),
+      "Max capacity: {0:.1f} RPS at the {1}% target at TaskMaxCount".format(
+        plan["max_rps"], plan["scale_out_utilization"]),
+    ]
+
+  lines.append("Scale-in: TaskMaxCount tasks start scaling in below {0:.1f} RPS ({1:g}%"
+               " alarm)".format(plan["scale_in_rps"], plan["scale_in_utilization"]))
+
+  if "tasks_per_instance" in plan:
+    lines += [
+      "Tasks per instance: {0}".format(plan["tasks_per_instance"]),
+      "Stranded per instance: {0} CPU, {1} MiB memory".format(
+        plan["stranded_cpu"], plan["stranded_memory"]),
+    ]
+
+  return "\n".join(lines)
+
+
+def format_parameters(parameters):
+  """Formats the parameters as a CloudFormation CLI parameters file"""
+  import json
+
+  return json.dumps(
+    [{"ParameterKey": k, "ParameterValue": str(v)} for k, v in parameters.items()],
+    indent=2,
+  )
+
+
+def add_cli_arguments(cli_parser):
+  cli_parser.add_argument("-r", "--peak-rps",
+                          type=float,
+                          required=True,
+                          help="Peak number of requests per second that reach imgproxy")
+  cli_parser.add_argument("-p", "--processing-time",
+                          type=float,
+                          required=True,
+                          help="Mean processing time of a single image in seconds")
+  cli_parser.add_argument("-u", "--target-utilization",
+                          type=float,
+                          default=0.7,
+                          help=("Target concurrency utilization at the peak load. Should be below"
+                                " the 80%% scale-out alarm threshold for the step scaling mode."
+                                " Becomes ScalingTargetConcurrencyUtilization for the"
+                                " target-tracking scaling mode. Default: 0.7"))
+  cli_parser.add_argument("--scaling-mode",
+                          choices=["step", "target-tracking"],
+                          default="step",
+                          help="ScalingMode of the stack. Default: step")
+  cli_parser.add_argument("--min-rps",
+                          type=float,
+                          default=0,
+                          help="Off-peak number of requests per second. Default: 0")
+  cli_parser.add_argument("-t", "--launch-type",
+                          choices=["fargate", "ec2"],
+                          default="fargate",
+                          help="ESC Launch type. Default: fargate")
+  cli_parser.add_argument("-i", "--instance-type",
+                          choices=instance_types.instance_type_names(),
+                          default="c8g.medium",
+                          metavar="INSTANCE_TYPE",
+                          help="EC2 instance type (EC2 only). Default: c8g.medium")
+  cli_parser.add_argument("--container-cpu",
+                          type=int,
+                          help=("Amount of CPU to give to the container. By default, the smallest"
+                                " value that keeps TaskMaxCount within the limit of the template"
+                                " (the subnet addresses for Fargate, see the template options)"))
+  cli_parser.add_argument("--container-memory",
+                          type=int,
+                          help=("Amount of memory in megabytes to give to the container. By"
+                                " default, 2048 per vCPU for Fargate and an equal share of the"
+                                " instance memory for EC2"))
+  cli_parser.add_argument("--workers-per-vcpu",
+                          type=float,
+                          default=default_workers_per_vcpu,
+                          help=("Number of imgproxy workers per vCPU (IMGPROXY_WORKERS divided by"
+                                " the number of vCPUs). Default: 2"))
+  cli_parser.add_argument("--min-tasks",
+                          type=int,
+                          default=2,
+                          help="Minimum number of tasks to keep running. Default: 2")
+  cli_parser.add_argument("-o", "--output",
+                          type=str,
+                          help=("Parameters file name. When not set, the parameters will be"
+                                " printed to stdout"))
+
+
+def main(args, cli_parser):
+  import dataclasses
+  import sys
+
+  try:
+    options = dataclasses.replace(template.options_from_args(args), launch_type=args.launch_type)
+    plan = plan_capacity(
+      peak_rps=args.peak_rps,
+      processing_time=args.processing_time,
+      target_utilization=args.target_utilization,
+      min_rps=args.min_rps,
+      launch_type=args.launch_type,
+      container_cpu=args.container_cpu,
+      container_memory=args.container_memory,
+      instance_type=args.instance_type,
+      workers_per_vcpu=args.workers_per_vcpu,
+      min_tasks=args.min_tasks,
+      scaling_mode=args.scaling_mode,
+      options=options,
+    )
+  except (ValueError, OSError) as e:
+    cli_parser.error(str(e))
+
+  print(format_plan(plan), file=sys.stderr)
+  template.write_output(format_parameters(plan["parameters"]), args.output)
@@ -0,0 +1,599 @@
+import collections
+import math
+import re
+import sys
+
+import template
+
+# The smallest period of the autoscaling alarms
+default_tick = 10
+
+# Target tracking policies use 1-minute datapoints. Application Auto Scaling scales out after 3
+# datapoints above the target and scales in after 15 datapoints below 90% of the target
+target_tracking_period = 60
+target_tracking_high_periods = 3
+target_tracking_low_periods = 15
+target_tracking_low_ratio = 0.9
+
+
+class Resolver:
+  """Resolves parameter references, conditions, and Fn::If in the template values"""
+
+  def __init__(self, data, parameters=None):
+    self.data = data
+    self.parameters = {
+      name: str(param.get("Default", ""))
+      for name, param in data.get("Parameters", {}).items()
+    }
+    self.parameters.update(parameters or {})
+
+  def condition(self, name):
+    return self.evaluate(self.data["Conditions"][name])
+
+  def evaluate(self, value):
+    if isinstance(value, dict):
+      if "Condition" in value and len(value) == 1:
+        return self.condition(value["Condition"])
+      if "Fn::Equals" in value:
+        a, b = value["Fn::Equals"]
+        return str(self.resolve(a)) == str(self.resolve(b))
+      if "Fn::Not" in value:
+        return not self.evaluate(value["Fn::Not"][0])
+      if "Fn::And" in value:
+        return all(self.evaluate(v) for v in value["Fn::And"])
+      if "Fn::Or" in value:
+        return any(self.evaluate(v) for v in value["Fn::Or"])
+
+    raise ValueError("Unsupported condition: {0}".format(value))
+
+  def resolve(self, value):
+    if isinstance(value, dict):
+      if "Ref" in value and len(value) == 1:
+        return self.parameters.get(value["Ref"], value["Ref"])
+      if "Fn::If" in value:
+        name, if_true, if_false = value["Fn::If"]
+        return self.resolve(if_true if self.condition(name) else if_false)
+      if "Fn::Join" in value:
+        separator, items = value["Fn::Join"]
+        if isinstance(items, list):
+          return separator.join(str(self.resolve(v)) for v in items)
+      if "Fn::Sub" in value and isinstance(value["Fn::Sub"], str):
+        return re.sub(r"\$\{([\w:]+)\}",
+                      lambda m: str(self.parameters.get(m.group(1), m.group(0))),
+                      value["Fn::Sub"])
+
+    if isinstance(value, list):
+      return [self.resolve(v) for v in value]
+
+    return value
+
+  def resources(self, resource_type):
+    """Returns the resources of the type whose conditions are met"""
+    return {
+      name: resource
+      for name, resource in self.data.get("Resources", {}).items()
+      if resource["Type"] == resource_type
+      and ("Condition" not in resource or self.condition(resource["Condition"]))
+    }
+
+
+def load_template(path):
+  """Loads a generated YAML or JSON template as a dict"""
+  import cfn_flip
+
+  with open(path) as file:
+    data, _ = cfn_flip.load(file.read())
+
+  return data
+
+
+def load_scaling(data, parameters=None, target_name="AutoscalingScalableTarget"):
+  """Reads the scalable target and its scaling policies from the template.
+
+  Step scaling policies are read together with their ConcurrencyUtilization alarms, target
+  tracking policies are read as is. When the template has several scalable targets (service
+  pools), the target_name one is used.
+  """
+  resolver = Resolver(data, parameters)
+
+  targets = resolver.resources("AWS::ApplicationAutoScaling::ScalableTarget")
+  if len(targets) == 1:
+    target_name = next(iter(targets))
+  elif target_name not in targets:
+    raise ValueError("The template doesn't have the {0} scalable target".format(target_name))
+
+  target = targets[target_name]["Properties"]
+
+  policies = {}
+  target_tracking = []
+  for name, resource in resolver.resources("AWS::ApplicationAutoScaling::ScalingPolicy").items():
+    props = resource["Properties"]
+    if resolver.resolve(props["ScalingTargetId"]) != target_name:
+      continue
+
+    if props["PolicyType"] == "TargetTrackingScaling":
+      policy = load_target_tracking_policy(resolver, name, props)
+      if policy is not None:
+        target_tracking.append(policy)
+      continue
+
+    if props["PolicyType"] != "StepScaling":
+      continue
+
+    config = props["StepScalingPolicyConfiguration"]
+    policies[name] = {
+      "name": name,
+      "adjustment_type": resolver.resolve(config["AdjustmentType"]),
+      "cooldown": int(resolver.resolve(config.get("Cooldown", 0))),
+      "steps": [
+        {
+          "lower": resolve_float(resolver, step.get("MetricIntervalLowerBound")),
+          "upper": resolve_float(resolver, step.get("MetricIntervalUpperBound")),
+          "adjustment": float(resolver.resolve(step["ScalingAdjustment"])),
+        }
+        for step in config["StepAdjustments"]
+      ],
+    }
+
+  alarms = []
+  for name, resource in resolver.resources("AWS::CloudWatch::Alarm").items():
+    props = resource["Properties"]
+    actions = [resolver.resolve(a) for a in props.get("AlarmActions", [])]
+    actions = [a for a in actions if a in policies]
+
+    period = concurrency_period(props)
+    if not actions or period is None:
+      continue
+
+    alarms.append({
+      "name": name,
+      "policy": policies[actions[0]],
+      "period": int(resolver.resolve(period)),
+      "terms": load_score_terms(resolver, props),
+      "evaluation_periods": int(resolver.resolve(props["EvaluationPeriods"])),
+      "threshold": float(resolver.resolve(props["Threshold"])),
+      "comparison": resolver.resolve(props["ComparisonOperator"]),
+    })
+
+  if not alarms and not target_tracking:
+    raise ValueError("The template doesn't have ConcurrencyUtilization step scaling alarms"
+                     " or target tracking policies")
+
+  return {
+    "min_capacity": int(resolver.resolve(target["MinCapacity"])),
+    "max_capacity": int(resolver.resolve(target["MaxCapacity"])),
+    "desired_count": int(resolver.parameters.get("TaskDesiredCount", 1)),
+    "alarms": alarms,
+    "target_tracking": target_tracking,
+  }
+
+
+def concurrency_period(props):
+  """Returns the period of the ConcurrencyUtilization metric of the alarm or None"""
+  if "Metrics" not in props:
+    return props["Period"] if props.get("MetricName") == "ConcurrencyUtilization" else None
+
+  for query in props["Metrics"]:
+    stat = query.get("MetricStat")
+    if stat is not None and stat["Metric"]["MetricName"] == "ConcurrencyUtilization":
+      return stat["Period"]
+
+  return None
+
+
+def load_score_terms(resolver, props):
+  """Returns the (metric name, factor) terms of the alarm value.
+
+  Metric math alarms should return the MAX([...]) of the metrics multiplied and divided by
+  constants, like the load score of the generated templates. FILL() is ignored.
+  """
+  if "Metrics" not in props:
+    return [("ConcurrencyUtilization", 1.0)]
+
+  metric_names = {q["Id"]: q["MetricStat"]["Metric"]["MetricName"]
+                  for q in props["Metrics"] if "MetricStat" in q}
+  [expression] = [resolver.resolve(q["Expression"]) for q in props["Metrics"]
+                  if "Expression" in q and q.get("ReturnData", True)]
+
+  expression = re.sub(r"FILL\((\w+),[^)]*\)", r"\1", expression.replace(" ", ""))
+  match = re.fullmatch(r"MAX\(\[(.*)\]\)", expression)
+  if match is None:
+    raise ValueError("Unsupported metric math expression: {0}".format(expression))
+
+  terms = []
+  for term in match.group(1).split(","):
+    tokens = re.split(r"([*/])", term)
+    if tokens[0] not in metric_names:
+      raise ValueError("Unsupported metric math expression term: {0}".format(term))
+
+    factor = 1.0
+    for operator, operand in zip(tokens[1::2], tokens[2::2]):
+      factor = factor * float(operand) if operator == "*" else factor / float(operand)
+
+    terms.append((metric_names[tokens[0]], factor))
+
+  return terms
+
+
+def load_target_tracking_policy(resolver, name, props):
+  """Reads the target tracking policy. Returns None if the simulator can't model its metric"""
+  config = props["TargetTrackingScalingPolicyConfiguration"]
+
+  if "CustomizedMetricSpecification" in config:
+    metric = resolver.resolve(config["CustomizedMetricSpecification"]["MetricName"])
+  else:
+    metric = resolver.resolve(config["PredefinedMetricSpecification"]["PredefinedMetricType"])
+
+  if metric not in ("ConcurrencyUtilization", "ALBRequestCountPerTarget"):
+    return None
+
+  return {
+    "name": name,
+    "metric": metric,
+    "target": float(resolver.resolve(config["TargetValue"])),
+    "scale_out_cooldown": int(resolver.resolve(config.get("ScaleOutCooldown", 300))),
+    "scale_in_cooldown": int(resolver.resolve(config.get("ScaleInCooldown", 300))),
+    "disable_scale_in": str(resolver.resolve(config.get("DisableScaleIn", False))).lower()
+    == "true",
+  }
+
+
+def resolve_float(resolver, value):
+  return None if value is None else float(resolver.resolve(value))
+
+
+def load_trace(path):
+  """Loads a CSV trace of the request load, one row per minute.
+
+  The CSV should have a header with either the "rps" column (requests per second) or the
+  "requests" column (requests per minute). Other columns are ignored.
+  """
+  import csv
+
+  with open(path, newline="") as file:
+    reader = csv.DictReader(file)
+
+    if reader.fieldnames and "rps" in reader.fieldnames:
+      return [float(row["rps"]) for row in reader]
+
+    if reader.fieldnames and "requests" in reader.fieldnames:
+      return [float(row["requests"]) / 60 for row in reader]
+
+  raise ValueError("{0}: the trace should have the 'rps' or 'requests' column".format(path))
+
+
+def breaches(alarm, value):
+  comparison = alarm["comparison"]
+  threshold = alarm["threshold"]
+
+  if comparison == "GreaterThanThreshold":
+    return value > threshold
+  if comparison == "GreaterThanOrEqualToThreshold":
+    return value >= threshold
+  if comparison == "LessThanThreshold":
+    return value < threshold
+  if comparison == "LessThanOrEqualToThreshold":
+    return value <= threshold
+
+  raise ValueError("Unsupported comparison operator: {0}".format(comparison))
+
+
+def step_adjustment(policy, breach, capacity):
+  """Returns the capacity change for the metric breach the way Application Auto Scaling does"""
+  for step in policy["steps"]:
+    lower = -math.inf if step["lower"] is None else step["lower"]
+    upper = math.inf if step["upper"] is None else step["upper"]
+
+    # Bounds are inclusive towards the threshold
+    if lower <= breach < upper if breach >= 0 else lower < breach <= upper:
+      break
+  else:
+    return 0
+
+  adjustment = step["adjustment"]
+
+  if policy["adjustment_type"] == "ExactCapacity":
+    return int(adjustment) - capacity
+
+  if policy["adjustment_type"] == "ChangeInCapacity":
+    return int(adjustment)
+
+  change = capacity * adjustment / 100
+
+  # Application Auto Scaling rounds values between -1 and 1 away from zero and truncates the rest
+  if 0 < change < 1:
+    return 1
+  if -1 < change < 0:
+    return -1
+
+  return int(change)
+
+
+def tracking_capacity(policy, value, capacity, max_capacity):
+  """Returns the capacity that brings the metric to the target value"""
+  if math.isinf(value):
+    return max_capacity
+
+  # Rounding hides the floating point error, e.g. 3 tasks at 70% with the 70% target
+  return math.ceil(round(capacity * value / policy["target"], 6))
+
+
+def simulated_metrics(utilization, processing_time):
+  """Returns the load score metrics estimated from the concurrency utilization.
+
+  imgproxy workers are CPU-bound, so the CPU is as busy as the workers. When all of the workers
+  are busy, the requests wait in the queue and the response time grows with the utilization.
+  Memory utilization is not modeled.
+  """
+  return {
+    "ConcurrencyUtilization": utilization,
+    "CPUUtilization": min(utilization, 100),
+    "TargetResponseTime": processing_time * max(utilization / 100, 1),
+  }
+
+
+def unmodeled_metrics(scaling):
+  """Returns the names of the alarm metrics with non-zero weights the simulator doesn't model"""
+  modeled = simulated_metrics(0, 0)
+
+  return sorted({metric for alarm in scaling["alarms"] for metric, factor in alarm["terms"]
+                 if factor != 0 and metric not in modeled})
+
+
+def load_score(terms, metrics):
+  """Returns the maximum of the weighted metrics. Zero weights drop the metric"""
+  return max([factor * metrics[metric] for metric, factor in terms
+              if factor != 0 and metric in metrics] or [0])
+
+
+def simulate(scaling, trace, processing_time, workers_per_task=2, startup_time=60,
+             utilization_threshold=80, tick=default_tick):
+  """Replays the per-minute load trace against the scaling policies.
+
+  Tasks become ready startup_time seconds after scale-out. The ConcurrencyUtilization metric is
+  the number of in-flight requests estimated with Little's law divided by the number of workers
+  of the ready tasks. The step scaling alarms evaluate the load score of the period averages of
+  the metrics from simulated_metrics. Step policies are invoked on every evaluation of an alarm in
+  the ALARM state and respect their cooldowns.
+
+  Target tracking policies are modeled after the alarms Application Auto Scaling creates for
+  them: the service scales out proportionally when the metric is above the target for
+  target_tracking_high_periods minutes and scales in when all of the policies have the metric
+  below target_tracking_low_ratio of the target for target_tracking_low_periods minutes.
+
+  Returns a dict with the summary and the per-tick timeline.
+  """
+  min_capacity = scaling["min_capacity"]
+  max_capacity = scaling["max_capacity"]
+  target_tracking = scaling.get("target_tracking", [])
+
+  desired = min(max(scaling["desired_count"], min_capacity), max_capacity)
+  # Times when the tasks become ready
+  tasks = [0] * desired
+
+  datapoints = {a["name"]: collections.deque(maxlen=a["evaluation_periods"])
+                for a in scaling["alarms"]}
+  datapoints.update({p["name"]: collections.deque(maxlen=target_tracking_low_periods)
+                     for p in target_tracking})
+  period_values = {a["name"]: [] for a in scaling["alarms"] + target_tracking}
+
+  last_scale_out = -math.inf
+  last_scale_out_cooldown = 0
+  last_scale_in = -math.inf
+  last_scale_in_cooldown = 0
+
+  summary = {
+    "seconds_above_threshold": 0,
+    "task_seconds": 0,
+    "scale_out_events": 0,
+    "scale_in_events": 0,
+    "max_tasks": len(tasks),
+    "peak_utilization": 0,
+  }
+  timeline = []
+
+  def scale(now, new_desired, scale_out_cooldown, scale_in_cooldown):
+    nonlocal tasks, last_scale_out, last_scale_out_cooldown, last_scale_in, \
+      last_scale_in_cooldown
+
+    new_desired = min(max(new_desired, min_capacity), max_capacity)
+
+    if new_desired > len(tasks):
+      if now - last_scale_out < last_scale_out_cooldown:
+        return
+
+      tasks += [now + startup_time] * (new_desired - len(tasks))
+      last_scale_out = now
+      last_scale_out_cooldown = scale_out_cooldown
+      summary["scale_out_events"] += 1
+
+    elif new_desired < len(tasks):
+      if now - last_scale_in < last_scale_in_cooldown or \
+         now - last_scale_out < last_scale_out_cooldown:
+        return
+
+      # Pending tasks are stopped first
+      tasks = sorted(tasks)[:new_desired]
+      last_scale_in = now
+      last_scale_in_cooldown = scale_in_cooldown
+      summary["scale_in_events"] += 1
+
+    summary["max_tasks"] = max(summary["max_tasks"], len(tasks))
+
+  for t in range(0, len(trace) * 60, tick):
+    rps = trace[t // 60]
+    ready = sum(1 for ready_at in tasks if ready_at <= t)
+
+    concurrency = rps * processing_time
+    if ready > 0:
+      utilization = concurrency / (ready * workers_per_task) * 100
+      request_count = rps * 60 / ready
+    else:
+      utilization = 0 if concurrency == 0 else math.inf
+      request_count = 0 if rps == 0 else math.inf
+
+    summary["task_seconds"] += len(tasks) * tick
+    summary["peak_utilization"] = max(summary["peak_utilization"], utilization)
+    if utilization > utilization_threshold:
+      summary["seconds_above_threshold"] += tick
+
+    timeline.append((t, rps, len(tasks), ready, utilization))
+
+    now = t + tick
+
+    metrics = simulated_metrics(utilization, processing_time)
+
+    for alarm in scaling["alarms"]:
+      values = period_values[alarm["name"]]
+      values.append(metrics)
+
+      if now % alarm["period"] != 0:
+        continue
+
+      averages = {metric: sum(v[metric] for v in values) / len(values) for metric in metrics}
+      datapoint = load_score(alarm["terms"], averages)
+      values.clear()
+
+      points = datapoints[alarm["name"]]
+      points.append(datapoint)
+
+      if len(points) < alarm["evaluation_periods"] or not all(breaches(alarm, v) for v in points):
+        continue
+
+      policy = alarm["policy"]
+      change = step_adjustment(policy, datapoint - alarm["threshold"], len(tasks))
+      scale(now, len(tasks) + change, policy["cooldown"], policy["cooldown"])
+
+    if not target_tracking:
+      continue
+
+    for policy in target_tracking:
+      period_values[policy["name"]].append(
+        utilization if policy["metric"] == "ConcurrencyUtilization" else request_count)
+
+    if now % target_tracking_period != 0:
+      continue
+
+    scale_out = []
+    scale_in = []
+    for policy in target_tracking:
+      values = period_values[policy["name"]]
+      datapoint = sum(values) / len(values)
+      values.clear()
+
+      points = datapoints[policy["name"]]
+      points.append(datapoint)
+      capacity = tracking_capacity(policy, datapoint, len(tasks), max_capacity)
+
+      high = list(points)[-target_tracking_high_periods:]
+      if len(high) == target_tracking_high_periods and all(v > policy["target"] for v in high):
+        scale_out.append((capacity, policy))
+      elif len(points) == target_tracking_low_periods and not policy["disable_scale_in"] and \
+          all(v < policy["target"] * target_tracking_low_ratio for v in points):
+        scale_in.append((capacity, policy))
+
+    if scale_out:
+      capacity, policy = max(scale_out, key=lambda item: item[0])
+      scale(now, capacity, policy["scale_out_cooldown"], policy["scale_in_cooldown"])
+    elif len(scale_in) == len(target_tracking):
+      capacity, policy = max(scale_in, key=lambda item: item[0])
+      scale(now, capacity, policy["scale_out_cooldown"], policy["scale_in_cooldown"])
+
+  summary["minutes_above_threshold"] = summary.pop("seconds_above_threshold") / 60
+  summary["task_hours"] = summary.pop("task_seconds") / 3600
+
+  return {"summary": summary, "timeline": timeline}
+
+
+def format_summary(summary, utilization_threshold=80):
+  return "\n".join([
+    "Time above {0}% utilization: {1:.1f} min".format(
+      utilization_threshold, summary["minutes_above_threshold"]),
+    "Task-hours: {0:.2f}".format(summary["task_hours"]),
+    "Scale-out events: {0}".format(summary["scale_out_events"]),
+    "Scale-in events: {0}".format(summary["scale_in_events"]),
+    "Max tasks: {0}".format(summary["max_tasks"]),
+    "Peak utilization: {0:.1f}%".format(summary["peak_utilization"]),
+  ])
+
+
+def add_cli_arguments(cli_parser):
+  cli_parser.add_argument("trace",
+                          type=str,
+                          help=("CSV file with the per-minute load. Should have either the 'rps'"
+                                " or the 'requests' (per minute) column"))
+  cli_parser.add_argument("-p", "--processing-time",
+                          type=float,
+                          required=True,
+                          help="Mean processing time of a single image in seconds")
+  cli_parser.add_argument("-T", "--template",
+                          type=str,
+                          help=("Generated template file (YAML or JSON). When not set, the"
+                                " template is generated with the --launch-type option"))
+  cli_parser.add_argument("-t", "--launch-type",
+                          choices=["fargate", "ec2"],
+                          default="fargate",
+                          help="ESC Launch type. Default: fargate")
+  cli_parser.add_argument("-P", "--parameter",
+                          type=str,
+                          action="append",
+                          metavar="KEY=VALUE",
+                          help=("Override a template parameter value, e.g. TaskMaxCount=20. Can be"
+                                " used multiple times"))
+  cli_parser.add_argument("-w", "--workers-per-task",
+                          type=int,
+                          default=2,
+                          help="Number of imgproxy workers per task (IMGPROXY_WORKERS). Default: 2")
+  cli_parser.add_argument("--startup-time",
+                          type=int,
+                          default=60,
+                          help="Seconds until a new task starts serving requests. Default: 60")
+  cli_parser.add_argument("--utilization-threshold",
+                          type=float,
+                          default=80,
+                          help="Utilization threshold to report the time above. Default: 80")
+  cli_parser.add_argument("-o", "--output",
+                          type=str,
+                          help="Write the simulation timeline as CSV to this file")
+
+
+def main(args, cli_parser):
+  parameters = {}
+  for item in args.parameter or []:
+    key, sep, value = item.partition("=")
+    if not sep:
+      cli_parser.error("Invalid parameter: {0}".format(item))
+    parameters[key] = value
+
+  try:
+    if args.template is not None:
+      data = load_template(args.template)
+    else:
+      options = template.Options(launch_type=args.launch_type, no_network=True)
+      data = template.build_template(options).to_dict()
+
+    scaling = load_scaling(data, parameters)
+    trace = load_trace(args.trace)
+  except (ValueError, OSError, KeyError) as e:
+    cli_parser.error(str(e))
+
+  unmodeled = unmodeled_metrics(scaling)
+  if unmodeled:
+    print("Warning: the simulation ignores these load score signals: {0}".format(
+      ", ".join(unmodeled)), file=sys.stderr)
+
+  result = simulate(
+    scaling,
+    trace,
+    processing_time=args.processing_time,
+    workers_per_task=args.workers_per_task,
+    startup_time=args.startup_time,
+    utilization_threshold=args.utilization_threshold,
+  )
+
+  print(format_summary(result["summary"], args.utilization_threshold))
+
+  if args.output is not None:
+    lines = ["time,rps,tasks,ready_tasks,utilization"]
+    lines += ["{0},{1},{2},{3},{4:.1f}".format(*row) for row in result["timeline"]]
+    template.write_output("\n".join(lines) + "\n", args.output)
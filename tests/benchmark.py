@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import template  # noqa: E402
+from variants import snapshot_variants  # noqa: E402
+
+default_baseline = os.path.join(os.path.dirname(__file__), "benchmark-baseline.json")
+
+cli_parser = argparse.ArgumentParser(description="imgproxy CloudFormation template benchmark")
+cli_parser.add_argument("-r", "--repeat",
+                        type=int,
+                        default=20,
+                        help="Number of builds to measure for each variant. Default: 20")
+cli_parser.add_argument("-b", "--baseline",
+                        type=str,
+                        default=default_baseline,
+                        help="Baseline file. Default: tests/benchmark-baseline.json")
+cli_parser.add_argument("-u", "--update-baseline",
+                        action="store_true",
+                        help="Write the results to the baseline file instead of comparing them")
+cli_parser.add_argument("--history",
+                        type=str,
+                        help="Append the results as a JSON line to this file")
+cli_parser.add_argument("--max-time-regression",
+                        type=float,
+                        default=1.0,
+                        help=("Maximum allowed relative increase of the normalized build time."
+                              " Default: 1.0 (100%%)"))
+cli_parser.add_argument("--max-memory-regression",
+                        type=float,
+                        default=0.5,
+                        help=("Maximum allowed relative increase of the peak memory usage."
+                              " Default: 0.5 (50%%)"))
+cli_parser.add_argument("--max-size-regression",
+                        type=float,
+                        default=0.1,
+                        help=("Maximum allowed relative increase of the template size and the"
+                              " number of resources. Default: 0.1 (10%%)"))
+
+
+def calibrate(repeat=5):
+  """Measures a fixed pure-Python workload to normalize build times across machines"""
+  data = {"key{0}".format(i): [{"value": j, "name": str(j)} for j in range(20)]
+          for i in range(200)}
+
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    json.loads(json.dumps(data, indent=1))
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+
+  return best
+
+
+def measure(options, repeat):
+  # Warm up lazy imports
+  out = template.render_template(template.build_template(options))
+
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    t = template.build_template(options)
+    out = template.render_template(t)
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+
+  tracemalloc.start()
+  template.render_template(template.build_template(options))
+  _, peak_memory = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+
+  return {
+    "time_ms": round(best * 1000, 3),
+    "peak_memory": peak_memory,
+    "bytes": len(out.encode("utf-8")),
+    "resources": len(t.resources),
+  }
+
+
+def git_revision():
+  try:
+    return subprocess.check_output(
+      ["git", "rev-parse", "--short", "HEAD"],
+      cwd=os.path.dirname(os.path.abspath(__file__)),
+      stderr=subprocess.DEVNULL,
+    ).decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def compare(name, result, baseline, args):
+  """Returns a list of regressions of the result compared to the baseline"""
+  checks = [
+    ("normalized_time", args.max_time_regression),
+    ("peak_memory", args.max_memory_regression),
+    ("bytes", args.max_size_regression),
+    ("resources", args.max_size_regression),
+  ]
+
+  regressions = []
+
+  for key, max_regression in checks:
+    if not baseline.get(key):
+      continue
+
+    change = result[key] / baseline[key] - 1
+    if change > max_regression:
+      regressions.append("{0}: {1} regressed by {2:.1%} ({3} -> {4}), max allowed {5:.1%}".format(
+        name, key, change, baseline[key], result[key], max_regression))
+
+  return regressions
+
+
+def main():
+  args = cli_parser.parse_args()
+
+  calibration = calibrate()
+  results = {}
+
+  print("{0:<50}  {1:>9}  {2:>10}  {3:>11}  {4:>9}  {5:>9}".format(
+    "Template", "Time, ms", "Normalized", "Peak memory", "Bytes", "Resources"))
+
+  for name, options in snapshot_variants():
+    result = measure(options, args.repeat)
+    result["normalized_time"] = round(result["time_ms"] / 1000 / calibration, 2)
+    results[name] = result
+
+    print("{0:<50}  {1:>9.2f}  {2:>10.2f}  {3:>11}  {4:>9}  {5:>9}".format(
+      name, result["time_ms"], result["normalized_time"], result["peak_memory"],
+      result["bytes"], result["resources"]))
+
+  if args.history is not None:
+    with open(args.history, "a") as file:
+      file.write(json.dumps({
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "results": results,
+      }) + "\n")
+
+  if args.update_baseline:
+    baseline = {
+      name: {k: v for k, v in result.items() if k != "time_ms"}
+      for name, result in results.items()
+    }
+
+    with open(args.baseline, "w") as file:
+      json.dump(baseline, file, indent=2, sort_keys=True)
+      file.write("\n")
+
+    return
+
+  if not os.path.exists(args.baseline):
+    cli_parser.error("Baseline {0} doesn't exist, use --update-baseline".format(args.baseline))
+
+  with open(args.baseline) as file:
+    baseline = json.load(file)
+
+  regressions = []
+  for name, result in results.items():
+    if name in baseline:
+      regressions += compare(name, result, baseline[name], args)
+
+  if regressions:
+    cli_parser.exit(1, "\n".join(regressions) + "\n")
+
+
+if __name__ == "__main__":
+  main()
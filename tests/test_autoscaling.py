@@ -0,0 +1,78 @@
+import simulator
+import template
+
+
+def test_load_score_alarms():
+  data = template.build_template(template.Options(no_network=True)).to_dict()
+  resources = data["Resources"]
+
+  high = resources["AutoscalingHighConcurrencyUsageAlarm"]["Properties"]
+  low = resources["AutoscalingLowConcurrencyUsageAlarm"]["Properties"]
+  queries = {q["Id"]: q for q in high["Metrics"]}
+
+  assert [q["Id"] for q in high["Metrics"] if q["ReturnData"]] == ["load"]
+  assert queries["cpu"]["MetricStat"]["Metric"]["Namespace"] == "AWS/ECS"
+  assert queries["responseTime"]["MetricStat"]["Stat"] == "p95"
+  assert {q["MetricStat"]["Period"] for q in high["Metrics"] if "MetricStat" in q} == {10}
+  assert {q["MetricStat"]["Period"] for q in low["Metrics"] if "MetricStat" in q} == {30}
+
+  # Every parameter the expression references exists
+  expression = queries["load"]["Expression"]["Fn::Sub"]
+  for name in ["ScalingConcurrencyWeight", "ScalingCpuWeight", "ScalingMemoryWeight",
+               "ScalingResponseTimeWeight", "ScalingTargetResponseTime"]:
+    assert "${" + name + "}" in expression
+    assert name in data["Parameters"]
+
+  # The scale-out fires when any signal is high, the scale-in when all of them are low
+  assert expression.startswith("MAX([")
+  assert (high["Threshold"], high["ComparisonOperator"]) == (80, "GreaterThanThreshold")
+  assert (low["Threshold"], low["ComparisonOperator"]) == (50, "LessThanThreshold")
+
+
+def test_simulator_reads_load_score_alarms():
+  data = template.build_template(template.Options(launch_type="ec2", no_network=True)).to_dict()
+  alarms = {a["name"]: a for a in simulator.load_scaling(data)["alarms"]}
+
+  assert alarms["AutoscalingHighConcurrencyUsageAlarm"]["period"] == 30
+  assert alarms["AutoscalingLowConcurrencyUsageAlarm"]["evaluation_periods"] == 20
+
+
+def test_simulator_load_score_terms():
+  data = template.build_template(template.Options(no_network=True)).to_dict()
+  alarms = {a["name"]: a for a in simulator.load_scaling(data, {
+    "ScalingConcurrencyWeight": "1.5",
+    "ScalingResponseTimeWeight": "0.5",
+    "ScalingTargetResponseTime": "2000",
+  })["alarms"]}
+
+  assert alarms["AutoscalingHighConcurrencyUsageAlarm"]["terms"] == [
+    ("ConcurrencyUtilization", 1.5),
+    ("CPUUtilization", 1.0),
+    ("MemoryUtilization", 1.0),
+    # Seconds to percents of the target response time
+    ("TargetResponseTime", 25.0),
+  ]
+
+
+def test_simulator_load_score_weights():
+  data = template.build_template(template.Options(no_network=True)).to_dict()
+  parameters = {"TaskMinCount": "2", "TaskDesiredCount": "2"}
+
+  def max_tasks(**weights):
+    scaling = simulator.load_scaling(data, dict(parameters, **weights))
+    # 2 requests in flight with 2 tasks of 2 workers: 50% utilization
+    result = simulator.simulate(scaling, [10] * 10, processing_time=0.2, startup_time=0)
+    return result["summary"]["max_tasks"]
+
+  assert max_tasks() == 2
+  # Doubled concurrency weight makes the same load look like 100% utilization
+  assert max_tasks(ScalingConcurrencyWeight="2") > 2
+  # 200 ms responses are above the 100 ms target response time
+  assert max_tasks(ScalingResponseTimeWeight="1", ScalingTargetResponseTime="100") > 2
+  # The step scaling ignores the zero-weighted signals
+  assert max_tasks(ScalingConcurrencyWeight="0", ScalingCpuWeight="0") == 2
+
+  scaling = simulator.load_scaling(data, parameters)
+  assert simulator.unmodeled_metrics(scaling) == ["MemoryUtilization"]
+  scaling = simulator.load_scaling(data, dict(parameters, ScalingMemoryWeight="0"))
+  assert simulator.unmodeled_metrics(scaling) == []
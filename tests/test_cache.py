@@ -0,0 +1,54 @@
+import os
+import time
+
+import template
+
+
+def test_cache_hit_skips_build(tmp_path, monkeypatch):
+  cache = template.TemplateCache(str(tmp_path / "cache"))
+  output = str(tmp_path / "template.yml")
+  options = template.Options()
+  render_options = template.RenderOptions()
+
+  stats = template.build_output(options, render_options, output, cache)
+
+  with open(output) as file:
+    expected = file.read()
+
+  def fail(_):
+    raise AssertionError("The template should be taken from the cache")
+
+  monkeypatch.setattr(template, "build_template", fail)
+
+  os.remove(output)
+  assert template.build_output(options, render_options, output, cache) == stats
+
+  with open(output) as file:
+    assert file.read() == expected
+
+
+def test_cache_key_depends_on_options():
+  render_options = template.RenderOptions()
+
+  assert template.cache_key(template.Options(), render_options) != \
+    template.cache_key(template.Options(no_network=True), render_options)
+  assert template.cache_key(template.Options(), render_options) != \
+    template.cache_key(template.Options(), template.RenderOptions(compact=True))
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+  cache = template.TemplateCache(str(tmp_path), max_entries=2)
+
+  cache.put("a", {"out": "a"})
+  cache.put("b", {"out": "b"})
+
+  # Make sure "a" is used more recently than "b"
+  past = time.time() - 10
+  os.utime(cache.entry_path("b"), (past, past))
+  assert cache.get("a") == {"out": "a"}
+
+  cache.put("c", {"out": "c"})
+
+  assert cache.has("a")
+  assert not cache.has("b")
+  assert cache.has("c")
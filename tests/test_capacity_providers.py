@@ -0,0 +1,55 @@
+import simulator
+import template
+
+
+def resolve_strategy(data, parameters=None):
+  strategy = data["Resources"]["ECSService"]["Properties"]["CapacityProviderStrategy"]
+  resolver = simulator.Resolver(data, parameters)
+
+  return [{key: resolver.resolve(value) for key, value in provider.items()}
+          for provider in resolver.resolve(strategy)]
+
+
+def test_fargate_spot_strategy():
+  data = template.build_template(template.Options(no_cluster=True, no_network=True)).to_dict()
+
+  assert resolve_strategy(data) == [
+    {"CapacityProvider": "FARGATE", "Base": "1", "Weight": "1"},
+  ]
+
+  assert resolve_strategy(data, {"FargateBaseCount": "2", "FargateSpotWeight": "3"}) == [
+    {"CapacityProvider": "FARGATE", "Base": "2", "Weight": "1"},
+    {"CapacityProvider": "FARGATE_SPOT", "Weight": "3"},
+  ]
+
+
+def test_fargate_spot_cluster():
+  resources = template.build_template(template.Options()).to_dict()["Resources"]
+  associations = resources["ECSClusterCapacityProviderAssociations"]["Properties"]
+
+  assert associations["CapacityProviders"] == ["FARGATE", "FARGATE_SPOT"]
+
+
+def test_ec2_uses_cluster_strategy():
+  resources = template.build_template(template.Options(launch_type="ec2")).to_dict()["Resources"]
+
+  assert "CapacityProviderStrategy" not in resources["ECSService"]["Properties"]
+
+
+def test_fargate_spot_deregistration_delay():
+  data = template.build_template(template.Options()).to_dict()
+  rule = data["Rules"]["testFargateSpotDeregistrationDelay"]
+  [assertion] = rule["Assertions"]
+  too_long, _ = assertion["Assert"]["Fn::Not"][0]["Fn::Contains"]
+
+  # The delay leaves time to stop the task before the two-minute Spot warning ends
+  assert rule["RuleCondition"] == {"Fn::Not": [{"Fn::Equals": [{"Ref": "FargateSpotWeight"}, "0"]}]}
+  assert "90" not in too_long
+  assert {"91", "120"} <= set(too_long)
+
+  description = data["Parameters"]["FargateSpotWeight"]["Description"]
+  assert "FARGATE_SPOT" not in description
+
+  no_cluster = template.build_template(template.Options(no_cluster=True, no_network=True))
+  assert "FARGATE_SPOT capacity provider" in \
+    no_cluster.to_dict()["Parameters"]["FargateSpotWeight"]["Description"]
@@ -0,0 +1,356 @@
+import base64
+import hashlib
+import hmac
+import http.server
+import importlib.util
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+
+import pytest
+
+import template
+
+requires_node = pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+
+
+def function_code(resource_name, **variables):
+  """Returns the function code from the template with the Fn::Sub placeholders filled in"""
+  data = template.build_template(template.Options()).to_dict()
+  code, _ = data["Resources"][resource_name]["Properties"]["FunctionCode"]["Fn::Sub"]
+
+  return re.sub(r"\$\{(\w+)\}", lambda m: variables[m.group(1)], code)
+
+
+def run_viewer_request(requests, **variables):
+  """Runs the viewer request function for each of the requests and returns the results"""
+  variables = dict({
+    "NormalizeAccept": "false",
+    "VerifySignature": "false",
+    "SignatureKeys": "",
+    "SignatureSalts": "",
+    "SignatureSize": "32",
+  }, **variables)
+  code = function_code("CloudFrontViewerRequestFunction", **variables)
+  runner = ("\nvar requests = JSON.parse(require('fs').readFileSync(0, 'utf8'));"
+            "\nprocess.stdout.write(JSON.stringify(requests.map(function (request) {"
+            "\n  return handler({ request: request });"
+            "\n})));")
+
+  result = subprocess.run(["node", "-e", code + runner],
+                          input=json.dumps(requests), capture_output=True, text=True, check=True)
+  return json.loads(result.stdout)
+
+
+def viewer_request(accept=None, uri="/insecure/rs:fit:300/plain/image.jpg"):
+  headers = {"host": {"value": "example.cloudfront.net"}}
+  if accept is not None:
+    headers["accept"] = {"value": accept}
+
+  return {"method": "GET", "uri": uri, "headers": headers}
+
+
+def imgproxy_signature(key, salt, path, size=32):
+  """Signs the path following the imgproxy URL signature docs"""
+  digest = hmac.new(bytes.fromhex(key), bytes.fromhex(salt) + path.encode(), hashlib.sha256)
+  return base64.urlsafe_b64encode(digest.digest()[:size]).rstrip(b"=").decode()
+
+
+# The example from the imgproxy URL signature docs
+signature_key = "736563726574"
+signature_salt = "68656C6C6F"
+signature_path = ("/rs:fill:300:400:0/g:sm/aHR0cDovL2V4YW1w/bGUuY29tL2ltYWdl/cy9jdXJpb3NpdHku"
+                  "/anBn.png")
+signature = "oKfUtW34Dvo2BGQehJFR4Nr0_rIjOtdtzJ3QFsUcXH8"
+
+
+@requires_node
+@pytest.mark.parametrize("accept,normalized", [
+  # Chrome
+  ("image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8", "image/avif,image/webp"),
+  # Safari 17
+  ("image/webp,image/avif,image/jxl,image/heic,image/heic-sequence,video/*;q=0.8,image/png,"
+   "image/svg+xml,image/*;q=0.8,*/*;q=0.5", "image/jxl,image/avif,image/webp"),
+  # Firefox
+  ("image/avif,image/webp,*/*", "image/avif,image/webp"),
+  ("image/webp,*/*", "image/webp"),
+  ("image/png,image/*;q=0.8,*/*;q=0.5", None),
+  ("*/*", None),
+  (None, None),
+])
+def test_accept_normalization(accept, normalized):
+  [request] = run_viewer_request([viewer_request(accept)], NormalizeAccept="true")
+
+  assert request["headers"].get("accept") == ({"value": normalized} if normalized else None)
+  assert request["headers"]["host"] == {"value": "example.cloudfront.net"}
+
+
+@requires_node
+def test_accept_normalization_disabled():
+  accept = "image/avif,image/webp,*/*"
+  [request] = run_viewer_request([viewer_request(accept)], NormalizeAccept="false")
+
+  assert request["headers"]["accept"] == {"value": accept}
+
+
+def test_signature_vector():
+  assert imgproxy_signature(signature_key, signature_salt, signature_path) == signature
+
+
+@requires_node
+@pytest.mark.parametrize("size", [32, 8])
+def test_signature_vector_verification(size):
+  truncated = base64.urlsafe_b64encode(
+    base64.urlsafe_b64decode(signature + "=")[:size]).rstrip(b"=").decode()
+
+  results = run_viewer_request(
+    [viewer_request(uri="/" + truncated + signature_path),
+     viewer_request(uri="/info/" + truncated + signature_path)],
+    SignatureKeys=signature_key,
+    SignatureSalts=signature_salt,
+    VerifySignature="true",
+    SignatureSize=str(size),
+  )
+
+  assert [r.get("uri") for r in results] == ["/" + truncated + signature_path,
+                                             "/info/" + truncated + signature_path]
+
+
+@requires_node
+@pytest.mark.parametrize("size", [32, 8])
+def test_signature_verification(size):
+  paths = [
+    signature_path,
+    "/rs:fit:300:300/plain/s3://bucket/pretty%20image.jpg@webp",
+    "/w:100/plain/https://example.com/image.jpg?size=large",
+    "/plain/local:///image.png",
+  ]
+
+  def signed(path, prefix=""):
+    return "{0}/{1}{2}".format(
+      prefix, imgproxy_signature(signature_key, signature_salt, path, size), path)
+
+  valid = [signed(p) for p in paths] + [signed(paths[0], "/info"), "/", "/health"]
+  invalid = [
+    "/insecure" + paths[0],
+    "/_" + paths[0],
+    signed(paths[0])[:-1],
+    signed(paths[0]).replace("/rs:fill:300", "/rs:fill:301"),
+    imgproxy_signature(signature_key, signature_salt, paths[0], size) + paths[0],
+    "/" + imgproxy_signature(signature_salt, signature_key, paths[0], size) + paths[0],
+    "/" + imgproxy_signature(signature_key, signature_salt, paths[0], 32 if size != 32 else 16)
+    + paths[0],
+    "/image.jpg",
+  ]
+
+  results = run_viewer_request(
+    [viewer_request(uri=uri) for uri in valid + invalid],
+    SignatureKeys=signature_key,
+    SignatureSalts=signature_salt,
+    VerifySignature="true",
+    SignatureSize=str(size),
+  )
+
+  for uri, result in zip(valid, results):
+    assert result.get("uri") == uri, uri
+  for uri, result in zip(invalid, results[len(valid):]):
+    assert result == {"statusCode": 403, "statusDescription": "Forbidden"}, uri
+
+
+@requires_node
+def test_signature_verification_multiple_keys():
+  old_key, old_salt = "6f6c64", "73616c74"
+  uris = [
+    "/" + imgproxy_signature(signature_key, signature_salt, signature_path) + signature_path,
+    "/" + imgproxy_signature(old_key, old_salt, signature_path) + signature_path,
+    "/" + imgproxy_signature(signature_key, old_salt, signature_path) + signature_path,
+  ]
+
+  results = run_viewer_request(
+    [viewer_request(uri=uri) for uri in uris],
+    SignatureKeys=signature_key + "," + old_key,
+    SignatureSalts=signature_salt + ", " + old_salt,
+    VerifySignature="true",
+  )
+
+  assert [r.get("uri") for r in results] == uris[:2] + [None]
+
+
+@requires_node
+def test_signature_verification_mismatched_keys():
+  uri = "/" + signature + signature_path
+  results = run_viewer_request(
+    [viewer_request(uri=uri), viewer_request(uri="/health")],
+    SignatureKeys=signature_key + ",6f6c64",
+    SignatureSalts=signature_salt,
+    VerifySignature="true",
+  )
+
+  # imgproxy doesn't start with a different number of keys and salts, so nothing is valid
+  assert results == [{"statusCode": 403, "statusDescription": "Forbidden"},
+                     viewer_request(uri="/health")]
+
+
+@requires_node
+def test_signature_verification_disabled():
+  [request] = run_viewer_request([viewer_request()])
+
+  assert request["uri"] == "/insecure/rs:fit:300/plain/image.jpg"
+
+
+def load_function(name):
+  path = os.path.join(template.generator_dir, "functions", name + ".py")
+  spec = importlib.util.spec_from_file_location(name, path)
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+
+class FakeS3:
+  def __init__(self, keys=()):
+    self.objects = {key: {} for key in keys}
+
+  def head_object(self, Bucket, Key):
+    if Key not in self.objects:
+      raise Exception("Forbidden")
+
+  def put_object(self, Bucket, Key, **params):
+    self.objects[Key] = params
+
+
+class ResultCacheHandler(http.server.BaseHTTPRequestHandler):
+  accept_headers = []
+
+  def do_GET(self):
+    type(self).accept_headers.append(self.headers.get("Accept"))
+
+    self.send_response(200 if "missing" not in self.path else 404)
+    self.send_header("Content-Type", "image/png")
+    self.send_header("Cache-Control", "max-age=31536000, public")
+    if "auto" in self.path:
+      self.send_header("Vary", "Accept")
+    self.end_headers()
+    self.wfile.write(self.path.encode())
+
+  def log_message(self, *args):
+    pass
+
+
+def test_result_cache_log_uris():
+  writer = load_function("result_cache_writer")
+  fields = ["date", "time", "cs-method", "cs(Host)", "cs-uri-stem", "sc-status"]
+  lines = [
+    "#Version: 1.0",
+    "#Fields: " + " ".join(fields),
+    "2024-01-01\t00:00:00\tGET\td1.cloudfront.net\t/sig/rs:fit:300/plain/s3://b/a%2520b.jpg\t200",
+    "2024-01-01\t00:00:01\tGET\td1.cloudfront.net\t/sig/rs:fit:300/plain/s3://b/a%2520b.jpg\t200",
+    "2024-01-01\t00:00:02\tHEAD\td1.cloudfront.net\t/sig/plain/s3://b/head.jpg\t200",
+    "2024-01-01\t00:00:03\tGET\td1.cloudfront.net\t/bad/plain/s3://b/c.jpg\t403",
+    "2024-01-01\t00:00:04\tGET\td1.cloudfront.net\t/sig/plain/s3://b/d.jpg\t200",
+  ]
+
+  assert writer.log_uris(lines) == [
+    ("d1.cloudfront.net", "/sig/rs:fit:300/plain/s3://b/a%20b.jpg"),
+    ("d1.cloudfront.net", "/sig/plain/s3://b/d.jpg"),
+  ]
+  assert writer.object_key("/sig/rs:fit:300/plain/s3://b/a%20b.jpg") == \
+    "sig/rs:fit:300/plain/s3://b/a b.jpg"
+
+
+def test_result_cache_write_back():
+  writer = load_function("result_cache_writer")
+  server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ResultCacheHandler)
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+
+  try:
+    s3 = FakeS3(keys=["sig/cached.jpg"])
+    base_url = "http://127.0.0.1:{0}".format(server.server_address[1])
+    uris = ["/sig/cached.jpg", "/sig/new.jpg", "/sig/auto.jpg", "/sig/missing.jpg"]
+
+    ResultCacheHandler.accept_headers = []
+    assert writer.write_back(s3, "bucket", base_url, uris, concurrency=2) == 1
+    assert sorted(s3.objects) == ["sig/cached.jpg", "sig/new.jpg"]
+    assert s3.objects["sig/new.jpg"] == {
+      "Body": b"/sig/new.jpg",
+      "ContentType": "image/png",
+      "CacheControl": "max-age=31536000, public",
+    }
+    # The images are requested with the cache key of the popular browsers
+    assert ResultCacheHandler.accept_headers == [writer.ACCEPT_HEADER] * 3
+
+    # Nothing is requested after the deadline
+    ResultCacheHandler.accept_headers = []
+    deadline = time.monotonic() - 1
+    assert writer.write_back(FakeS3(), "bucket", base_url, uris, deadline) == 0
+    assert ResultCacheHandler.accept_headers == []
+  finally:
+    server.shutdown()
+    server.server_close()
+
+
+class CloudFrontHandler(http.server.BaseHTTPRequestHandler):
+  requests = []
+  lock = threading.Lock()
+  in_flight = 0
+  max_in_flight = 0
+
+  def do_GET(self):
+    cls = type(self)
+    with cls.lock:
+      cls.requests.append((self.path, self.headers.get("Accept")))
+      cls.in_flight += 1
+      cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+
+    time.sleep(0.02)
+
+    with cls.lock:
+      cls.in_flight -= 1
+
+    self.send_response(404 if "missing" in self.path else 200)
+    if "auto" in self.path:
+      self.send_header("Vary", "Accept")
+    self.end_headers()
+
+  def log_message(self, *args):
+    pass
+
+
+def test_cache_warmer():
+  warmer = load_function("cache_warmer")
+  server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), CloudFrontHandler)
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+
+  try:
+    paths = warmer.parse_url_list(
+      "# Hot images\n/sig/auto.jpg\n\n" + "".join("/sig/{0}.jpg\n".format(n) for n in range(20))
+      + "/sig/missing.jpg\n")
+    logs = []
+
+    stats = warmer.warm("http://127.0.0.1:{0}".format(server.server_address[1]), paths, 3,
+                        log=logs.append)
+  finally:
+    server.shutdown()
+    server.server_close()
+
+  assert stats == {"Total": 22, "Succeeded": 21, "Failed": 1, "Skipped": 0}
+  assert CloudFrontHandler.max_in_flight <= 3
+  # Only the responses depending on the Accept header are requested with every Accept header
+  assert len(CloudFrontHandler.requests) == 22 + len(warmer.ACCEPT_HEADERS) - 1
+  assert ("/sig/0.jpg", "image/avif,image/webp") in CloudFrontHandler.requests
+  assert ("/sig/auto.jpg", None) in CloudFrontHandler.requests
+  assert logs[-2] == "Warmed 22/22 URLs"
+
+
+def test_cache_warmer_limits():
+  warmer = load_function("cache_warmer")
+
+  assert warmer.max_concurrency(8, 2, 1024) == 4
+  assert warmer.max_concurrency(8, 10, 256) == 8
+  assert warmer.max_concurrency(8, 1, 256) == 1
+
+  stats = warmer.warm("http://127.0.0.1:1", ["/a", "/b"], 2, deadline=0, log=lambda _: None)
+  assert stats == {"Total": 2, "Succeeded": 0, "Failed": 0, "Skipped": 2}
@@ -0,0 +1,67 @@
+import instance_types
+import template
+
+
+def test_allowed_values_come_from_catalog():
+  names = instance_types.instance_type_names()
+
+  assert len(names) == len(set(names))
+  assert template.arm64_instance_types + template.amd64_instance_types == names
+  assert all(instance_types.get_instance_type(n).arch == "ARM64"
+             for n in template.arm64_instance_types)
+
+
+def test_tasks_per_instance():
+  instance = instance_types.get_instance_type("c7g.xlarge")
+
+  assert instance_types.tasks_per_instance(instance, 1024, 1920) == 4
+  # Memory is the bottleneck
+  assert instance_types.tasks_per_instance(instance, 1024, 4096) == 1
+  assert instance_types.tasks_per_instance(instance, 8192, 1024) == 0
+
+
+def evaluate(condition, values):
+  """Evaluates a CloudFormation rule condition with the parameter values"""
+  if "Ref" in condition:
+    return values[condition["Ref"]]
+
+  [(name, args)] = condition.items()
+  if name == "Fn::Contains":
+    return evaluate(args[1], values) in args[0]
+  if name == "Fn::Not":
+    return not evaluate(args[0], values)
+  if name == "Fn::And":
+    return all(evaluate(arg, values) for arg in args)
+  if name == "Fn::Or":
+    return any(evaluate(arg, values) for arg in args)
+  raise ValueError(name)
+
+
+def test_fit_rules_reject_oversized_tasks():
+  data = template.build_template(template.Options(launch_type="ec2")).to_dict()
+  rules = data["Rules"]
+  parameters = data["Parameters"]
+
+  def rejected(param, value, instance_type):
+    name = "testContainer{0}Fits".format(param[len("Container"):])
+    assertion = rules[name]["Assertions"][0]["Assert"]
+    return not evaluate(assertion, {param: str(value), "ClusterInstanceType": instance_type})
+
+  assert rejected("ContainerCpu", 2048, "c8g.medium")
+  assert not rejected("ContainerCpu", 2048, "c8g.large")
+  assert not rejected("ContainerCpu", 1024, "c8g.medium")
+  assert rejected("ContainerMemory", 4096, "t4g.medium")
+  assert not rejected("ContainerMemory", 4096, "t4g.large")
+  assert rejected("ContainerCpu", 65536, "c7i.12xlarge")
+  assert not rejected("ContainerCpu", 65536, "c7i.16xlarge")
+
+  # The parameters allow only the values the rules check, and every allowed value is checked
+  for param, capacity, off_grid in [("ContainerCpu", lambda t: t.cpu, 1536),
+                                    ("ContainerMemory", lambda t: t.available_memory, 4000)]:
+    allowed = parameters[param]["AllowedValues"]
+    assert off_grid not in allowed
+
+    for value in allowed:
+      for instance in instance_types.catalog:
+        assert rejected(param, value, instance.name) == (value > capacity(instance)), \
+          (param, value, instance.name)
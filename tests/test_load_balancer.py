@@ -0,0 +1,17 @@
+import template
+
+
+def test_target_group_draining_and_slow_start():
+  data = template.build_template(template.Options()).to_dict()
+  target_group = data["Resources"]["LoadBalancerTargetGroup"]["Properties"]
+  attributes = {a["Key"]: a["Value"] for a in target_group["TargetGroupAttributes"]}
+
+  # Slow start can't be combined with the least outstanding requests algorithm
+  assert attributes["load_balancing.algorithm.type"] == {
+    "Fn::If": ["EnableTargetSlowStart", "round_robin", "least_outstanding_requests"],
+  }
+  assert attributes["deregistration_delay.timeout_seconds"] == {"Ref": "TargetDeregistrationDelay"}
+
+  container = data["Resources"]["ECSTaskDefinition"]["Properties"]["ContainerDefinitions"][0]
+  assert container["StopTimeout"] == {"Ref": "TargetDeregistrationDelay"}
+  assert data["Parameters"]["TargetDeregistrationDelay"]["MaxValue"] == 120
@@ -0,0 +1,125 @@
+import dataclasses
+import re
+
+import pytest
+
+import template
+
+
+def test_default_address_plan():
+  public_subnets, private_subnets = template.address_plan(template.Options(subnets_number=16))
+
+  assert [str(s) for s in public_subnets] == ["10.0.{0}.0/20".format(n * 16) for n in range(16)]
+  assert private_subnets == []
+
+
+def test_private_address_plan():
+  options = template.Options(
+    private_subnets=True,
+    vpc_cidr="172.16.0.0/16",
+    public_subnet_prefix=24,
+    private_subnet_prefix=18,
+  )
+  public_subnets, private_subnets = template.address_plan(options)
+
+  assert [str(s) for s in public_subnets] == ["172.16.0.0/24", "172.16.1.0/24", "172.16.2.0/24"]
+  # Private subnets are aligned to their size and don't overlap the public ones
+  assert [str(s) for s in private_subnets] == ["172.16.64.0/18", "172.16.128.0/18",
+                                               "172.16.192.0/18"]
+  assert template.task_capacity(options) == 16384 - 5 - 5
+
+
+@pytest.mark.parametrize("options", [
+  template.Options(subnets_number=17),
+  template.Options(private_subnets=True, private_subnet_prefix=17),
+  # The internal load balancer needs /27 subnets
+  template.Options(private_subnets=True, private_subnet_prefix=28, cloudfront_vpc_origin=True),
+  template.Options(vpc_cidr="10.0.0.1/16"),
+  template.Options(public_subnet_prefix=28),
+  template.Options(private_subnets=True, no_network=True),
+  template.Options(private_subnets=True, nat_gateways="none", launch_type="ec2"),
+  # Tasks in public subnets would still get public IPv4 addresses
+  template.Options(dual_stack=True),
+  # The pools don't leave any addresses for the main service
+  template.Options(vpc_cidr="10.0.0.0/24", subnets_number=2, public_subnet_prefix=26,
+                   pools=(template.Pool(name="bulk", task_max_count=50),)),
+  template.Options(schedule=(template.ScheduledScaling(
+    name="peak", cron="0 8 * * *", task_min_count=1, task_max_count=100000),)),
+])
+def test_invalid_network_options(options):
+  assert template.validate_options(options) is not None
+
+
+def test_dual_stack_account_setting_check():
+  options = template.Options(private_subnets=True, dual_stack=True)
+  resources = template.build_template(options).to_dict()["Resources"]
+
+  assert resources["DualStackCheck"]["Type"] == "Custom::DualStackCheck"
+  assert "DualStackCheck" in resources["ECSService"]["DependsOn"]
+  assert resources["ECSService"]["Properties"]["NetworkConfiguration"]["AwsvpcConfiguration"][
+    "AssignPublicIp"] == "DISABLED"
+
+  # EC2 tasks use the instance network
+  ec2_options = template.Options(launch_type="ec2", private_subnets=True, dual_stack=True)
+  assert "DualStackCheck" not in template.build_template(ec2_options).to_dict()["Resources"]
+
+
+def test_task_max_count_limit():
+  options = template.Options(vpc_cidr="10.0.0.0/24", subnets_number=2, public_subnet_prefix=26)
+  # 64 addresses per subnet, 5 reserved, 8 for the load balancer, 5 for the interface endpoints
+  assert template.task_capacity(options) == 46
+  # Twice the tasks run during deployments
+  assert template.max_task_count(options) == 46
+
+  options = dataclasses.replace(options, pools=(template.Pool(name="bulk", task_max_count=10),))
+  assert template.max_task_count(options) == 36
+
+  parameters = template.build_template(options).to_dict()["Parameters"]
+  assert parameters["TaskMaxCount"]["MaxValue"] == 36
+
+
+def test_task_max_count_limit_vpc_origin():
+  options = template.Options(vpc_cidr="10.0.0.0/24", subnets_number=2, public_subnet_prefix=27,
+                             private_subnets=True, private_subnet_prefix=26)
+  # 64 addresses per subnet, 5 reserved, 5 for the interface endpoints
+  assert template.task_capacity(options) == 54
+
+  # The internal load balancer and the VPC origin network interfaces use the private subnets
+  options = dataclasses.replace(options, cloudfront_vpc_origin=True)
+  assert template.task_capacity(options) == 54 - 8 - 1
+  assert template.max_task_count(options) == 45
+
+  parameters = template.build_template(options).to_dict()["Parameters"]
+  assert parameters["TaskMaxCount"]["MaxValue"] == 45
+
+
+def test_vpc_origin_load_balancer_ingress():
+  resources = template.build_template(template.Options(
+    private_subnets=True, cloudfront_vpc_origin=True)).to_dict()["Resources"]
+
+  # Nothing in the VPC can reach the load balancer bypassing CloudFront
+  properties = resources["LoadBalancerSecurityGroup"]["Properties"]
+  assert properties["SecurityGroupIngress"] == {"Ref": "AWS::NoValue"}
+  ingress = resources["LoadBalancerCloudFrontIngress"]["Properties"]
+  assert ingress["SourcePrefixListId"] == {"Fn::GetAtt": ["CloudFrontPrefixList", "PrefixListId"]}
+  assert (ingress["FromPort"], ingress["ToPort"]) == (80, 443)
+
+
+def test_no_nat_gateways_endpoints():
+  options = template.Options(private_subnets=True, nat_gateways="none")
+  parameters = template.build_template(options).to_dict()["Parameters"]
+
+  for name in ["CreateS3GatewayEndpoint", "CreateInterfaceEndpoints"]:
+    assert parameters[name]["Default"] == "Yes"
+    assert parameters[name]["AllowedValues"] == ["Yes"]
+
+  # Docker Hub can't be reached without NAT gateways
+  assert "Default" not in parameters["DockerImage"]
+  pattern = parameters["DockerImage"]["AllowedPattern"]
+  assert re.fullmatch(pattern, "123456789012.dkr.ecr.eu-west-1.amazonaws.com/imgproxy:v3")
+  assert not re.fullmatch(pattern, "darthsim/imgproxy:v3")
+
+  parameters = template.build_template(template.Options(private_subnets=True)).to_dict()[
+    "Parameters"]
+  assert parameters["CreateS3GatewayEndpoint"]["AllowedValues"] == ["Yes", "No"]
+  assert parameters["DockerImage"]["Default"] == "darthsim/imgproxy:v3"
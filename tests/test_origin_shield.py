@@ -0,0 +1,26 @@
+import template
+
+
+def test_origin_shield_regions_map_to_themselves():
+  region_map = template.origin_shield_region_map()
+
+  for region in template.origin_shield_regions():
+    assert region_map[region] == region
+
+
+def test_origin_shield_region_map():
+  region_map = template.origin_shield_region_map()
+
+  assert region_map["us-west-1"] == "us-west-2"
+  assert region_map["ca-central-1"] == "us-east-1"
+  assert region_map["eu-north-1"] == "eu-west-2"
+  assert region_map["ap-southeast-4"] == "ap-southeast-2"
+  assert region_map["mx-central-1"] == "us-east-2"
+
+
+def test_origin_shield_region_parameter():
+  data = template.build_template(template.Options()).to_dict()
+  parameter = data["Parameters"]["OriginShieldRegion"]
+
+  assert parameter["AllowedValues"] == ["auto", "disabled"] + template.origin_shield_regions()
+  assert data["Mappings"]["OriginShieldRegionMap"]["il-central-1"] == {"Region": "eu-central-1"}
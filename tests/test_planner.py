@@ -0,0 +1,101 @@
+import dataclasses
+
+import pytest
+
+import planner
+import template
+
+
+def test_fargate_plan():
+  plan = planner.plan_capacity(peak_rps=500, processing_time=0.2, target_utilization=0.7)
+
+  # 100 requests in flight, 2 workers per task, 70% utilization
+  assert plan["parameters"] == {
+    "ContainerCpu": 1024,
+    "ContainerMemory": 2048,
+    "TaskDesiredCount": 2,
+    "TaskMinCount": 2,
+    "TaskMaxCount": 72,
+  }
+  assert plan["peak_utilization"] < 70
+  assert plan["scale_out_headroom"] == pytest.approx(80 / 70 - 1)
+
+
+def test_ec2_plan_packs_instances():
+  plan = planner.plan_capacity(peak_rps=500, processing_time=0.2, min_rps=50,
+                               launch_type="ec2", instance_type="c7g.xlarge")
+
+  assert plan["tasks_per_instance"] == 4
+  assert plan["stranded_cpu"] == 0
+  assert plan["parameters"]["ContainerMemory"] == 1920
+  assert plan["parameters"]["CpuArchitecture"] == "ARM64"
+  assert plan["parameters"]["TaskMinCount"] == 8
+  assert plan["parameters"]["ClusterMinSize"] == 2
+  assert plan["parameters"]["ClusterMaxSize"] == 18
+
+
+def test_ec2_plan_task_doesnt_fit():
+  with pytest.raises(ValueError):
+    planner.plan_capacity(peak_rps=10, processing_time=0.2, launch_type="ec2",
+                          instance_type="c8g.medium", container_cpu=2048)
+
+
+def test_target_utilization_above_alarm_threshold():
+  with pytest.raises(ValueError):
+    planner.plan_capacity(peak_rps=10, processing_time=0.2, target_utilization=0.9)
+
+
+def test_target_tracking_plan():
+  plan = planner.plan_capacity(peak_rps=500, processing_time=0.2, target_utilization=0.75,
+                               scaling_mode="target-tracking")
+
+  assert plan["parameters"]["TaskMaxCount"] == 67
+  assert plan["parameters"]["ScalingMode"] == "target-tracking"
+  assert plan["parameters"]["ScalingTargetConcurrencyUtilization"] == 75
+  assert plan["scale_in_utilization"] == pytest.approx(67.5)
+  assert plan["scale_out_headroom"] == pytest.approx(100 / 75 - 1)
+
+  # Target tracking allows targets above the step scaling alarm threshold
+  plan = planner.plan_capacity(peak_rps=500, processing_time=0.2, target_utilization=0.9,
+                               scaling_mode="target-tracking")
+  assert plan["parameters"]["ScalingTargetConcurrencyUtilization"] == 90
+
+
+def test_fargate_cpu_and_memory():
+  with pytest.raises(ValueError, match="CPU values: 256, 512, 1024"):
+    planner.plan_capacity(peak_rps=10, processing_time=0.2, container_cpu=3072)
+
+  with pytest.raises(ValueError, match="memory values for 1024 CPU"):
+    planner.plan_capacity(peak_rps=10, processing_time=0.2, container_memory=1024)
+
+  plan = planner.plan_capacity(peak_rps=10, processing_time=0.2, container_cpu=8192,
+                               container_memory=20480)
+  assert plan["parameters"]["ContainerMemory"] == 20480
+
+
+def test_fargate_plan_derives_cpu_from_subnet_limit():
+  options = template.Options(vpc_cidr="10.0.0.0/24", subnets_number=2, public_subnet_prefix=26)
+
+  # 72 tasks with 1024 CPU don't fit into the 46 tasks the subnets can hold
+  plan = planner.plan_capacity(peak_rps=500, processing_time=0.2, options=options)
+  assert plan["task_count_limit"] == 46
+  assert plan["parameters"]["ContainerCpu"] == 2048
+  assert plan["parameters"]["ContainerMemory"] == 4096
+  assert plan["parameters"]["TaskMaxCount"] == 36
+
+  with pytest.raises(ValueError, match="TaskMaxCount 72 with 1024 CPU exceeds the 46 tasks"):
+    planner.plan_capacity(peak_rps=500, processing_time=0.2, container_cpu=1024,
+                          options=options)
+
+  # The template without network uses existing subnets
+  options = dataclasses.replace(options, no_network=True)
+  plan = planner.plan_capacity(peak_rps=500, processing_time=0.2, options=options)
+  assert plan["task_count_limit"] is None
+  assert plan["parameters"]["ContainerCpu"] == 1024
+
+
+def test_ec2_plan_derives_cpu_fitting_instance():
+  plan = planner.plan_capacity(peak_rps=500, processing_time=0.2, launch_type="ec2",
+                               instance_type="c7g.xlarge")
+  assert plan["task_count_limit"] is None
+  assert plan["parameters"]["ContainerCpu"] == 1024
@@ -0,0 +1,59 @@
+import pytest
+
+import template
+
+
+def test_load_pools(tmp_path):
+  path = tmp_path / "pools.yml"
+  path.write_text("""
+- name: heavy-sources
+  container-cpu: 4096
+  container-memory: 8192
+  task-max-count: 2
+  path-patterns: ["/*.gif"]
+  query-strings:
+    pool: heavy
+- name: bulk
+  http-headers:
+    X-Imgproxy-Pool: [bulk, batch]
+""")
+
+  pools = template.load_pools(str(path))
+
+  assert pools == (
+    template.Pool(name="heavy-sources", container_cpu=4096, container_memory=8192,
+                  task_max_count=2, path_patterns=("/*.gif",),
+                  query_strings=(("pool", "heavy"),)),
+    template.Pool(name="bulk", http_headers=(("X-Imgproxy-Pool", ("bulk", "batch")),)),
+  )
+  assert pools[0].suffix == "PoolHeavySources"
+
+
+@pytest.mark.parametrize("pool", [
+  template.Pool(name="Heavy"),
+  template.Pool(name="heavy", container_cpu=3000),
+  template.Pool(name="heavy", task_min_count=5, task_max_count=4),
+  template.Pool(name="heavy", path_patterns=("*.gif",)),
+  template.Pool(name="heavy", path_patterns=("/*.gif", "/*.png", "/*.webp"),
+                http_headers=(("X-Pool", ("a", "b")),)),
+])
+def test_invalid_pools(pool):
+  assert template.validate_options(template.Options(pools=(pool,))) is not None
+
+
+def test_pool_listener_rules_go_first():
+  options = template.Options(pools=(
+    template.Pool(name="heavy", path_patterns=("/*.gif",)),
+    template.Pool(name="bulk"),
+  ))
+  resources = template.build_template(options).to_dict()["Resources"]
+
+  assert resources["LoadBalancerListenerRulePoolHeavy"]["Properties"]["Priority"] == 1
+  assert resources["LoadBalancerListenerRulePoolBulk"]["Properties"]["Priority"] == 2
+  assert resources["LoadBalancerListenerRule"]["Properties"]["Priority"] == 3
+
+  service = resources["ECSServicePoolHeavy"]["Properties"]
+  assert service["TaskDefinition"] == {"Ref": "ECSTaskDefinitionPoolHeavy"}
+  assert service["LoadBalancers"][0]["TargetGroupArn"] == \
+    {"Ref": "LoadBalancerTargetGroupPoolHeavy"}
+  assert "AutoscalingHighConcurrencyUsageAlarmPoolHeavy" in resources
@@ -0,0 +1,91 @@
+import pytest
+
+import template
+
+
+def test_load_schedule(tmp_path):
+  path = tmp_path / "schedule.yml"
+  path.write_text("""
+- name: morning
+  cron: "30 6 * * MON-FRI"
+  timezone: Europe/Berlin
+  task-min-count: 10
+  task-max-count: 30
+  cluster-min-size: 4
+- name: night
+  cron: "0 22 * * *"
+  task-min-count: 2
+""")
+
+  schedule = template.load_schedule(str(path))
+
+  assert schedule == (
+    template.ScheduledScaling(name="morning", cron="30 6 * * MON-FRI", timezone="Europe/Berlin",
+                              task_min_count=10, task_max_count=30, cluster_min_size=4),
+    template.ScheduledScaling(name="night", cron="0 22 * * *", task_min_count=2),
+  )
+  assert schedule[0].schedule_expression == "cron(30 6 ? * MON-FRI *)"
+  assert schedule[1].schedule_expression == "cron(0 22 * * ? *)"
+
+
+@pytest.mark.parametrize("action", [
+  template.ScheduledScaling(name="Morning", cron="0 7 * * *", task_min_count=4),
+  template.ScheduledScaling(name="morning", cron="0 7 * *", task_min_count=4),
+  template.ScheduledScaling(name="morning", cron="0 7 * * 1-5", task_min_count=4),
+  template.ScheduledScaling(name="morning", cron="0 7 1 * MON", task_min_count=4),
+  template.ScheduledScaling(name="morning", cron="0 7 * * *", task_min_count=4,
+                            task_max_count=2),
+  template.ScheduledScaling(name="morning", cron="0 7 * * *", task_min_count=4,
+                            cluster_min_size=2),
+])
+def test_invalid_schedule(action):
+  assert template.validate_options(template.Options(schedule=(action,))) is not None
+
+
+def test_scheduled_actions():
+  options = template.Options(launch_type="ec2", schedule=(
+    template.ScheduledScaling(name="morning", cron="30 6 * * MON-FRI", task_min_count=10,
+                              cluster_min_size=4, timezone="Europe/Berlin"),
+    template.ScheduledScaling(name="night", cron="0 22 * * *", task_min_count=2,
+                              task_max_count=8),
+  ))
+  assert template.validate_options(options) is None
+
+  resources = template.build_template(options).to_dict()["Resources"]
+
+  actions = resources["AutoscalingScalableTarget"]["Properties"]["ScheduledActions"]
+  assert actions == [
+    {
+      "ScheduledActionName": "morning",
+      "Schedule": "cron(30 6 ? * MON-FRI *)",
+      "Timezone": "Europe/Berlin",
+      "ScalableTargetAction": {"MinCapacity": 10},
+    },
+    {
+      "ScheduledActionName": "night",
+      "Schedule": "cron(0 22 * * ? *)",
+      "Timezone": "UTC",
+      "ScalableTargetAction": {"MinCapacity": 2, "MaxCapacity": 8},
+    },
+  ]
+
+  # Only the actions with the cluster size change the EC2 Auto Scaling group
+  assert resources["EC2AutoScalingGroupScheduledActionMorning"]["Properties"] == {
+    "AutoScalingGroupName": {"Ref": "EC2AutoScalingGroup"},
+    "MinSize": 4,
+    "Recurrence": "30 6 * * MON-FRI",
+    "TimeZone": "Europe/Berlin",
+  }
+  assert "EC2AutoScalingGroupScheduledActionNight" not in resources
+
+
+def test_all_variants_drop_cluster_sizes():
+  action = template.ScheduledScaling(name="morning", cron="0 7 * * *", task_min_count=4,
+                                     cluster_min_size=2)
+  variants = template.all_variants(template.Options(schedule=(action,)))
+
+  assert len(variants) == len(template.all_variants())
+  for variant in variants:
+    [variant_action] = variant["options"].schedule
+    has_cluster = variant["options"].launch_type == "ec2" and not variant["options"].no_cluster
+    assert variant_action.cluster_min_size == (2 if has_cluster else None)
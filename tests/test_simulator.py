@@ -0,0 +1,123 @@
+import pytest
+
+import simulator
+import template
+
+
+@pytest.fixture(scope="module")
+def scaling():
+  data = template.build_template(template.Options(no_network=True)).to_dict()
+  return simulator.load_scaling(data, {"TaskMinCount": "2", "TaskMaxCount": "10"})
+
+
+def test_load_scaling(scaling):
+  assert scaling["min_capacity"] == 2
+  assert scaling["max_capacity"] == 10
+
+  alarms = {a["name"]: a for a in scaling["alarms"]}
+  high = alarms["AutoscalingHighConcurrencyUsageAlarm"]
+  low = alarms["AutoscalingLowConcurrencyUsageAlarm"]
+
+  assert (high["period"], high["evaluation_periods"], high["threshold"]) == (10, 2, 80)
+  assert (low["period"], low["evaluation_periods"], low["threshold"]) == (30, 10, 50)
+  assert high["policy"]["cooldown"] == 30
+  assert low["policy"]["cooldown"] == 300
+
+
+def test_step_adjustment_rounding(scaling):
+  alarms = {a["name"]: a for a in scaling["alarms"]}
+  scale_out = alarms["AutoscalingHighConcurrencyUsageAlarm"]["policy"]
+  scale_in = alarms["AutoscalingLowConcurrencyUsageAlarm"]["policy"]
+
+  # 20% of 2 tasks is rounded up to 1
+  assert simulator.step_adjustment(scale_out, 10, 2) == 1
+  # 40% of 6 tasks is truncated to 2
+  assert simulator.step_adjustment(scale_out, 30, 6) == 2
+  assert simulator.step_adjustment(scale_out, 150, 6) == 6
+  assert simulator.step_adjustment(scale_in, -20, 5) == -1
+
+
+def test_simulate_scales_out_and_in(scaling):
+  # Overload for 30 minutes, then idle for an hour
+  trace = [60] * 30 + [0] * 60
+  result = simulator.simulate(scaling, trace, processing_time=0.2, startup_time=60)
+  summary = result["summary"]
+
+  assert summary["max_tasks"] == 10
+  assert summary["scale_out_events"] > 0
+  assert summary["scale_in_events"] > 0
+  assert result["timeline"][-1][2] == 2
+  assert 0 < summary["minutes_above_threshold"] < 30
+
+
+def test_simulate_steady_load(scaling):
+  # 4 requests in flight with 2 tasks of 2 workers: 100% utilization until the scale-out
+  result = simulator.simulate(scaling, [20] * 10, processing_time=0.2, startup_time=0)
+  summary = result["summary"]
+
+  assert summary["scale_out_events"] == 1
+  assert summary["max_tasks"] == 3
+  assert summary["peak_utilization"] == pytest.approx(100)
+
+
+@pytest.fixture(scope="module")
+def template_data():
+  return template.build_template(template.Options(no_network=True)).to_dict()
+
+
+def test_load_target_tracking(template_data):
+  scaling = simulator.load_scaling(template_data, {"ScalingMode": "target-tracking"})
+
+  assert scaling["alarms"] == []
+  assert scaling["target_tracking"] == [{
+    "name": "AutoscalingConcurrencyTrackingPolicy",
+    "metric": "ConcurrencyUtilization",
+    "target": 70,
+    "scale_out_cooldown": 30,
+    "scale_in_cooldown": 300,
+    "disable_scale_in": False,
+  }]
+
+  scaling = simulator.load_scaling(template_data, {
+    "ScalingMode": "target-tracking",
+    "ScalingTargetRequestCount": "600",
+    "ScalingDisableScaleIn": "Yes",
+  })
+  policies = {p["metric"]: p for p in scaling["target_tracking"]}
+
+  assert policies["ALBRequestCountPerTarget"]["target"] == 600
+  assert all(p["disable_scale_in"] for p in policies.values())
+
+
+def test_simulate_target_tracking(template_data):
+  parameters = {"ScalingMode": "target-tracking", "TaskMinCount": "2", "TaskMaxCount": "20"}
+  scaling = simulator.load_scaling(template_data, parameters)
+
+  # 14 requests in flight (350% utilization of 2 tasks) need 20 workers at 70% utilization
+  trace = [70] * 20 + [0] * 60
+  result = simulator.simulate(scaling, trace, processing_time=0.2, startup_time=0)
+  summary = result["summary"]
+
+  # Target tracking jumps to the required capacity at once
+  assert summary["scale_out_events"] == 1
+  assert summary["max_tasks"] == 10
+  assert summary["scale_in_events"] > 0
+  assert result["timeline"][-1][2] == 2
+
+  # The request count policy scales out further, but scale-in is disabled
+  scaling = simulator.load_scaling(template_data, dict(
+    parameters, ScalingTargetRequestCount="300", ScalingDisableScaleIn="Yes"))
+  result = simulator.simulate(scaling, trace, processing_time=0.2, startup_time=0)
+
+  # 2100 requests per task per minute need 14 tasks at 300
+  assert result["summary"]["max_tasks"] == 14
+  assert result["summary"]["scale_in_events"] == 0
+
+
+def test_load_scaling_with_pools():
+  options = template.Options(no_network=True, pools=(template.Pool("bulk", task_max_count=3),))
+  data = template.build_template(options).to_dict()
+
+  assert simulator.load_scaling(data)["max_capacity"] == 8
+  assert simulator.load_scaling(data, target_name="AutoscalingScalableTargetPoolBulk")[
+    "max_capacity"] == 3
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+import template
+from variants import snapshot_variants
+
+snapshots_dir = os.path.join(os.path.dirname(__file__), "snapshots")
+
+# Set UPDATE_SNAPSHOTS=1 to write the current output as the new snapshots
+update_snapshots = os.environ.get("UPDATE_SNAPSHOTS") == "1"
+
+variants = snapshot_variants()
+
+
+@pytest.mark.parametrize("name,options", variants, ids=[name for name, _ in variants])
+def test_snapshot(name, options):
+  out = template.render_template(template.build_template(options))
+  path = os.path.join(snapshots_dir, name + ".yml")
+
+  if update_snapshots:
+    with open(path, "w") as file:
+      file.write(out)
+    return
+
+  assert os.path.exists(path), \
+    "Snapshot {0} doesn't exist, run the tests with UPDATE_SNAPSHOTS=1".format(name)
+
+  with open(path) as file:
+    expected = file.read()
+
+  assert out == expected, \
+    "Template {0} doesn't match the snapshot, run the tests with UPDATE_SNAPSHOTS=1".format(name)
+
+
+def test_snapshots_are_used():
+  names = set(name + ".yml" for name, _ in variants)
+  stale = sorted(set(os.listdir(snapshots_dir)) - names)
+
+  assert not stale, "Stale snapshots: {0}".format(", ".join(stale))
+
+
+def test_invalid_options():
+  with pytest.raises(ValueError):
+    template.build_template(template.Options(launch_type="ec2", no_cluster=True))
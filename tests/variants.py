@@ -0,0 +1,64 @@
+import template
+
+# Subnets number matters only for the templates that create network resources
+subnets_numbers = [2, 3, 6]
+
+
+# Network layouts that are not covered by all_variants
+extra_variants = [
+  ("ecs-fargate-no-cluster-with-network", template.Options(no_cluster=True)),
+  ("ecs-fargate-full-private-subnets", template.Options(private_subnets=True)),
+  ("ecs-ec2-full-private-subnets-single-nat-dual-stack", template.Options(
+    launch_type="ec2",
+    private_subnets=True,
+    nat_gateways="single",
+    vpc_cidr="172.16.0.0/16",
+    public_subnet_prefix=24,
+    private_subnet_prefix=20,
+    dual_stack=True,
+  )),
+  ("ecs-fargate-full-private-subnets-dual-stack", template.Options(
+    private_subnets=True,
+    dual_stack=True,
+  )),
+  ("ecs-fargate-full-cloudfront-vpc-origin", template.Options(
+    private_subnets=True,
+    cloudfront_vpc_origin=True,
+  )),
+  ("ecs-fargate-full-pools", template.Options(pools=(
+    template.Pool(
+      name="animated",
+      container_cpu=4096,
+      container_memory=8192,
+      task_max_count=2,
+      path_patterns=("/*.gif", "/*.mp4"),
+    ),
+    template.Pool(
+      name="bulk",
+      task_min_count=0,
+      http_headers=(("X-Imgproxy-Pool", ("bulk",)),),
+    ),
+  ))),
+]
+
+
+def snapshot_variants():
+  """Returns (name, options) pairs for every valid combination of the generator options"""
+  variants = []
+
+  for subnets_number in subnets_numbers:
+    for variant in template.all_variants(template.Options(subnets_number=subnets_number)):
+      options = variant["options"]
+
+      if not options.no_network:
+        name = "{0}-{1}-subnets".format(variant["name"], subnets_number)
+      elif subnets_number == template.Options().subnets_number:
+        name = variant["name"]
+      else:
+        continue
+
+      variants.append((name, options))
+
+  variants += extra_variants
+
+  return variants